@@ -543,6 +543,22 @@ document.addEventListener("DOMContentLoaded", () => {
     }, 50);
   }
 
+  /**
+   * Asks the backend to load a model in Ollama ahead of the first question.
+   * Fire-and-forget: failures only matter for logging, the ask itself reports errors.
+   */
+  function prewarmModel(modelName) {
+    if (!modelName) return;
+    fetch(`${BACKEND_URL}/api/models/prewarm`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ model: modelName }),
+    })
+      .then((response) => response.json())
+      .then((data) => console.log(`Prewarm ${modelName}:`, data))
+      .catch((error) => console.warn(`Prewarm of ${modelName} failed:`, error));
+  }
+
   /**
    * Fetches the list of models from the backend and populates the dropdown.
    */
@@ -853,6 +869,7 @@ document.addEventListener("DOMContentLoaded", () => {
   modelSelect.addEventListener("change", (event) => {
     currentSelectedModel = event.target.value;
     console.log(`Model selection changed to: ${currentSelectedModel}`);
+    prewarmModel(currentSelectedModel); // Load it while the user types
   });
 
   // Refresh model list on button click
@@ -0,0 +1,152 @@
+# python-backend/admission.py
+
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a generation cannot be admitted; carries a Retry-After hint in seconds."""
+
+    def __init__(self, message: str, retry_after: int, queue_full: bool):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.queue_full = queue_full # False means the request waited and timed out
+
+
+class _ModelGate:
+    """Concurrency slots and wait-queue bookkeeping for one model."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.avg_service_seconds: float | None = None # EMA of how long a slot is held
+
+
+class AdmissionController:
+    """
+    Per-model admission control for Ollama generations.
+
+    Each model gets `max_concurrent` generation slots (overridable per model).
+    Requests beyond that wait in a bounded FIFO queue of `max_queue` entries; when
+    the queue is full, or a request has waited `queue_timeout` seconds, it is
+    rejected with a Retry-After estimate derived from recent service times, so
+    callers fail fast instead of piling up behind a busy model. Gates (and their
+    service-time estimates and counters) of models in `model_limits` or
+    `keep_models` persist while idle; other models' gates only exist while they
+    have requests running or waiting, so unknown or mistyped names don't accumulate.
+
+    Args:
+        max_concurrent: Default generation slots per model.
+        max_queue: Default number of requests allowed to wait per model.
+        queue_timeout: Seconds a request may wait for a slot.
+        model_limits: Per-model overrides of `max_concurrent`.
+        keep_models: Further models whose gates are kept while idle (e.g. the default model).
+    """
+
+    def __init__(self, max_concurrent: int = 2, max_queue: int = 8, queue_timeout: float = 30.0,
+                 model_limits: dict[str, int] | None = None, keep_models=()):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.model_limits = {model: max(1, limit) for model, limit in (model_limits or {}).items()}
+        self.keep_models = set(self.model_limits) | set(keep_models)
+        self._gates: dict[str, _ModelGate] = {}
+
+    def _gate(self, model: str) -> _ModelGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            gate = _ModelGate(self.model_limits.get(model, self.max_concurrent))
+            self._gates[model] = gate
+        return gate
+
+    def _discard_if_idle(self, model: str, gate: _ModelGate):
+        """Forgets an idle gate of a model not in keep_models, so arbitrary model names don't accumulate."""
+        if model not in self.keep_models and gate.active == 0 and gate.waiting == 0 and self._gates.get(model) is gate:
+            del self._gates[model]
+
+    def _retry_after(self, gate: _ModelGate) -> int:
+        """Rough seconds until a slot frees up for a newly arriving request."""
+        service = gate.avg_service_seconds or 5.0
+        return max(1, math.ceil(service * (gate.waiting + 1) / gate.limit))
+
+    def check(self, model: str):
+        """
+        Fails fast if `model`'s wait queue is already full. Used before a response
+        stream starts, so the rejection can still be a plain HTTP error.
+
+        Raises:
+            AdmissionRejected: If the request would be rejected right now.
+        """
+        gate = self._gates.get(model)
+        if gate is not None and gate.active >= gate.limit and gate.waiting >= self.max_queue:
+            gate.rejected += 1
+            raise AdmissionRejected(
+                f"Too many requests for model '{model}' ({gate.active} running, {gate.waiting} queued).",
+                self._retry_after(gate), queue_full=True)
+
+    @asynccontextmanager
+    async def admit(self, model: str):
+        """
+        Holds one of `model`'s generation slots for the duration of the block,
+        waiting in the queue if necessary.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out.
+        """
+        gate = self._gate(model)
+        if gate.semaphore.locked():
+            self.check(model)
+            gate.waiting += 1
+            try:
+                await asyncio.wait_for(gate.semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                gate.timed_out += 1
+                retry_after = self._retry_after(gate)
+                gate.waiting -= 1
+                self._discard_if_idle(model, gate)
+                raise AdmissionRejected(
+                    f"Timed out after {self.queue_timeout:.0f}s waiting for model '{model}'.",
+                    retry_after, queue_full=False) from None
+            except BaseException:
+                gate.waiting -= 1
+                self._discard_if_idle(model, gate)
+                raise
+            gate.waiting -= 1
+        else:
+            await gate.semaphore.acquire()
+
+        gate.active += 1
+        gate.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            gate.active -= 1
+            gate.semaphore.release()
+            elapsed = time.monotonic() - started
+            gate.avg_service_seconds = elapsed if gate.avg_service_seconds is None else 0.8 * gate.avg_service_seconds + 0.2 * elapsed
+            self._discard_if_idle(model, gate)
+
+    def stats(self) -> dict:
+        return {
+            model: {
+                "limit": gate.limit,
+                "active": gate.active,
+                "waiting": gate.waiting,
+                "admitted": gate.admitted,
+                "rejected": gate.rejected,
+                "timed_out": gate.timed_out,
+                "avg_service_seconds": round(gate.avg_service_seconds, 2) if gate.avg_service_seconds is not None else None,
+            }
+            for model, gate in self._gates.items()
+        }
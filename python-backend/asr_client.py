@@ -1,123 +1,1019 @@
-import nemo.collections.asr as nemo_asr
+# NeMo (and torch) are imported lazily in _load_model_blocking so that importing
+# this module - and therefore starting the server - stays fast.
 # import soundfile as sf # No longer needed for reading initial file
 import numpy as np
 import io
 import os
-import tempfile
+import subprocess
 import asyncio
 import logging
+import queue
+import re
+import threading
+import time
 from pydub import AudioSegment # <-- Import pydub
-# import torch # Uncomment if explicitly using torch features like checking cuda
+
+import metrics
+from vad import EnergyVAD
 
 logger = logging.getLogger(__name__)
 TARGET_SAMPLE_RATE = 16000
-_asr_model = None # Global variable to hold the loaded model
+ASR_MODEL_NAME = "nvidia/parakeet-tdt-0.6b-v2"
+_asr_model = None # Global variable to hold the loaded model (set only once it is ready)
+_remote_worker = None # asr_worker.ASRWorkerClient when the model lives in a separate process
+_vad: EnergyVAD | None = None # Silence trimming before inference (None = disabled)
+
+# --- Model loading state ---
+ASR_NOT_LOADED = "not_loaded"
+ASR_LOADING = "loading"
+ASR_WARMING = "warming"
+ASR_READY = "ready"
+ASR_FAILED = "failed"
+
+_asr_state = {
+    "state": ASR_NOT_LOADED,
+    "progress": 0.0,     # Rough fraction of the loading sequence completed
+    "detail": None,      # Current loading step, or failure reason
+    "started_at": None,
+    "ready_at": None,
+    "profile": None,     # Inference profile actually in effect (device, backend, quantization, threads)
+}
+_asr_state_lock = threading.Lock()
+_load_thread: threading.Thread | None = None
+
+def _set_state(state: str, progress: float, detail: str | None = None):
+    with _asr_state_lock:
+        _asr_state.update(state=state, progress=progress, detail=detail)
+        if state == ASR_LOADING and _asr_state["started_at"] is None:
+            _asr_state["started_at"] = time.time()
+        if state == ASR_READY:
+            _asr_state["ready_at"] = time.time()
+    logger.info(f"ASR model state: {state} ({progress:.0%}){f' - {detail}' if detail else ''}")
+
+def get_asr_status() -> dict:
+    """Returns a copy of the ASR model loading state for /api/status."""
+    if _remote_worker is not None:
+        return _remote_worker.get_status()
+    with _asr_state_lock:
+        status = dict(_asr_state)
+    if status["started_at"] and status["ready_at"]:
+        status["load_seconds"] = round(status["ready_at"] - status["started_at"], 1)
+    return status
+
+def is_ready() -> bool:
+    """True if transcription requests can be served (locally or by the ASR worker)."""
+    if _remote_worker is not None:
+        return _remote_worker.get_status().get("state") == ASR_READY
+    return _asr_model is not None
+
+def use_remote_worker(worker_client):
+    """
+    Routes all transcriptions to an out-of-process ASR worker (see asr_worker.py)
+    instead of a model loaded in this process.
+    """
+    global _remote_worker
+    _remote_worker = worker_client
+
+# --- Inference profile ---
+DEFAULT_INFERENCE_PROFILE = {
+    "device": "auto",          # auto | cpu | cuda
+    "threads": 0,              # torch intra-op threads (0 = torch default, one per physical core)
+    "interop_threads": 0,      # torch inter-op threads (0 = torch default)
+    "quantization": "none",    # none | int8 (dynamic int8 of the encoder's Linear layers, CPU only)
+    "inference_mode": True,    # Run transcribe() under torch.inference_mode()
+    "backend": "pytorch",      # pytorch | onnx (encoder through ONNX Runtime)
+    "onnx_encoder_path": None, # Exported encoder; created on first use if missing
+}
+_inference_profile = dict(DEFAULT_INFERENCE_PROFILE)
+
+def configure_inference(**settings):
+    """Sets the inference profile used by the next model load (see DEFAULT_INFERENCE_PROFILE)."""
+    unknown = set(settings) - set(DEFAULT_INFERENCE_PROFILE)
+    if unknown:
+        raise ValueError(f"Unknown ASR inference setting(s): {', '.join(sorted(unknown))}")
+    _inference_profile.update(settings)
+
+
+def _resident_memory_mb() -> float | None:
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def _configure_torch_threads(torch, profile: dict) -> dict:
+    """Applies thread settings; must run before the first parallel torch op."""
+    if profile["threads"] > 0:
+        torch.set_num_threads(profile["threads"])
+    if profile["interop_threads"] > 0:
+        try:
+            torch.set_num_interop_threads(profile["interop_threads"])
+        except RuntimeError as e: # Only allowed once, before inter-op work started
+            logger.warning(f"Could not set torch inter-op threads: {e}")
+    return {"threads": torch.get_num_threads(), "interop_threads": torch.get_num_interop_threads()}
+
+
+class _OnnxEncoder:
+    """
+    Stand-in for the NeMo encoder module that runs it through ONNX Runtime.
+    Called like the encoder (audio_signal=..., length=...) and returns torch
+    tensors; any other attribute NeMo reads comes from the original encoder.
+    """
+
+    def __init__(self, session, original, torch):
+        self._session = session
+        self._original = original
+        self._torch = torch
+        self._input_names = [i.name for i in session.get_inputs()]
+
+    def __call__(self, audio_signal, length, **kwargs):
+        feeds = dict(zip(self._input_names, (audio_signal.cpu().numpy(), length.cpu().numpy().astype(np.int64))))
+        encoded, encoded_len = self._session.run(None, feeds)
+        return self._torch.from_numpy(encoded), self._torch.from_numpy(encoded_len)
+
+    forward = __call__
 
-# --- load_asr_model function remains the same ---
-async def load_asr_model():
-    """Loads the Parakeet ASR model into the global variable _asr_model."""
+    def __getattr__(self, name):
+        return getattr(self._original, name)
+
+
+def _use_onnx_encoder(model, profile: dict, torch) -> bool:
+    """Swaps the model's encoder for an ONNX Runtime session. Returns False if that isn't possible."""
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        logger.warning("ONNX backend requested but onnxruntime is not installed; using PyTorch.")
+        return False
+    path = profile["onnx_encoder_path"]
+    if not path:
+        logger.warning("ONNX backend requested without an encoder path; using PyTorch.")
+        return False
+    try:
+        if not os.path.exists(path):
+            _set_state(ASR_LOADING, 0.88, f"Exporting encoder to ONNX ({path})")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            model.encoder.export(path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if profile["threads"] > 0:
+            options.intra_op_num_threads = profile["threads"]
+        if profile["interop_threads"] > 0:
+            options.inter_op_num_threads = profile["interop_threads"]
+        session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+    except Exception as e:
+        logger.error(f"Failed to set up the ONNX encoder, using PyTorch: {e}", exc_info=True)
+        return False
+    original = model.encoder
+    try:
+        original.to("meta") # Free the PyTorch encoder weights; its config attributes stay readable
+    except Exception as e:
+        logger.debug(f"Could not release PyTorch encoder weights: {e}")
+    model._modules.pop("encoder", None)
+    object.__setattr__(model, "encoder", _OnnxEncoder(session, original, torch))
+    return True
+
+
+def _prepare_for_inference(model, profile: dict, torch) -> tuple:
+    """Moves the model to its device, applies quantization / the ONNX backend and returns the effective profile."""
+    device = profile["device"]
+    if device == "auto":
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    elif device == "cuda" and not torch.cuda.is_available():
+        logger.warning("[ASR] Device = cuda but CUDA is not available; using CPU.")
+        device = "cpu"
+    model = model.to(device)
+    model.eval()
+    effective = {"device": device, "backend": "pytorch", "quantization": "none", "inference_mode": profile["inference_mode"]}
+
+    if profile["backend"] == "onnx":
+        if device != "cpu":
+            logger.warning("The ONNX encoder backend is CPU-only here; keeping PyTorch on the GPU.")
+        elif _use_onnx_encoder(model, profile, torch):
+            effective["backend"] = "onnx"
+    if profile["quantization"] == "int8" and effective["backend"] == "pytorch":
+        if device != "cpu":
+            logger.warning("Dynamic int8 quantization only runs on CPU; skipping it on the GPU.")
+        else:
+            # Linear layers dominate the Conformer encoder; their weights become int8 and
+            # activations are quantized on the fly, cutting memory and matmul time on CPU.
+            model.encoder = torch.ao.quantization.quantize_dynamic(model.encoder, {torch.nn.Linear}, dtype=torch.qint8)
+            effective["quantization"] = "int8"
+    return model, effective
+
+
+def _transcribe_batch(model, batch: list[np.ndarray]):
+    """Runs model.transcribe on a list of clips under the configured inference context."""
+    if _inference_profile["inference_mode"]:
+        import torch
+        with torch.inference_mode():
+            return model.transcribe(batch, batch_size=len(batch))
+    return model.transcribe(batch, batch_size=len(batch))
+# --- End Inference profile ---
+
+
+def _load_model_blocking(warm_up: bool = True):
+    """
+    Imports NeMo, loads Parakeet with the configured inference profile and
+    optionally runs a warm-up inference. Runs in a background thread; the model
+    is published to _asr_model only once it is fully ready.
+    """
     global _asr_model
+    try:
+        profile = dict(_inference_profile)
+        _set_state(ASR_LOADING, 0.05, "Importing NeMo toolkit")
+        import torch
+        threads = _configure_torch_threads(torch, profile)
+        import nemo.collections.asr as nemo_asr
+
+        _set_state(ASR_LOADING, 0.3, f"Downloading/restoring {ASR_MODEL_NAME}")
+        model = nemo_asr.models.ASRModel.from_pretrained(model_name=ASR_MODEL_NAME, map_location=torch.device("cpu"))
+        _set_state(ASR_LOADING, 0.85, "Preparing model for inference")
+        model, effective = _prepare_for_inference(model, profile, torch)
+        effective.update(threads)
+
+        if warm_up:
+            # First inference pays one-off costs (kernel selection, allocator growth,
+            # lazy init); pay them now instead of on the first user request.
+            _set_state(ASR_WARMING, 0.9, "Running warm-up inference")
+            warm_up_audio = (np.random.default_rng(0).standard_normal(TARGET_SAMPLE_RATE) * 1e-3).astype(np.float32)
+            _transcribe_batch(model, [warm_up_audio])
+
+        effective["resident_memory_mb"] = _resident_memory_mb()
+        with _asr_state_lock:
+            _asr_state["profile"] = effective
+        logger.info(f"ASR inference profile: {effective}")
+        _asr_model = model
+        _set_state(ASR_READY, 1.0)
+    except ImportError as e:
+        logger.error(f"NeMo or its dependencies not found. Cannot load ASR model: {e}")
+        _set_state(ASR_FAILED, 0.0, f"NeMo not installed: {e}")
+    except Exception as e:
+        logger.error(f"Failed to load ASR model: {e}", exc_info=True)
+        _set_state(ASR_FAILED, 0.0, str(e))
+
+def start_background_load(warm_up: bool = True):
+    """Starts loading the ASR model in a background thread and returns immediately."""
+    global _load_thread
+    if _asr_model is not None or (_load_thread is not None and _load_thread.is_alive()):
+        logger.info("ASR model already loaded or loading.")
+        return
+    _load_thread = threading.Thread(target=_load_model_blocking, args=(warm_up,), name="asr-model-loader", daemon=True)
+    _load_thread.start()
+
+async def load_asr_model(warm_up: bool = True):
+    """Loads the Parakeet ASR model and waits for it (without blocking the event loop)."""
     if _asr_model is None:
-        try:
-            logger.info("Loading Parakeet ASR model (nvidia/parakeet-tdt-0.6b-v2)...")
-            _asr_model = nemo_asr.models.ASRModel.from_pretrained(
-                model_name="nvidia/parakeet-tdt-0.6b-v2"
-            )
-            _asr_model.eval()
-            logger.info("Parakeet ASR model loaded successfully.")
-        except ImportError:
-             logger.error("NeMo or its dependencies not found. Cannot load ASR model.")
-             _asr_model = None
-        except Exception as e:
-            logger.error(f"Failed to load ASR model: {e}", exc_info=True)
-            _asr_model = None
+        await asyncio.to_thread(_load_model_blocking, warm_up)
     else:
          logger.info("ASR model already loaded.")
-# --- End load_asr_model ---
 
+def unavailable_reason() -> str:
+    """Human-readable explanation of why the model cannot serve requests right now."""
+    status = get_asr_status()
+    if status["state"] in (ASR_LOADING, ASR_WARMING):
+        return f"ASR model is still loading ({status['state']}, {status['progress']:.0%}). Please retry shortly."
+    if status["state"] == ASR_FAILED:
+        return f"ASR model failed to load: {status['detail']}"
+    if status["state"] == "unreachable":
+        return f"ASR worker is not reachable: {status['detail']}"
+    return "ASR model is not available. Server might be starting or encountered loading error."
+# --- End Model loading state ---
+
+
+# --- In-memory audio decoding ---
+def _ffmpeg_pcm_command(low_latency: bool = False) -> list[str]:
+    """
+    ffmpeg argv that decodes any container on stdin to 16kHz mono float32 PCM on stdout.
+    With `low_latency`, input probing and output buffering are minimized so audio
+    written to stdin a chunk at a time comes out as soon as it is decodable.
+    """
+    ffmpeg_path = AudioSegment.converter or "ffmpeg" # Respect a custom pydub ffmpeg location
+    input_flags = ["-probesize", "32", "-analyzeduration", "0", "-fflags", "nobuffer"] if low_latency else []
+    output_flags = ["-flush_packets", "1"] if low_latency else []
+    return [
+        ffmpeg_path, "-hide_banner", "-loglevel", "error",
+        *input_flags, "-i", "pipe:0",
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE),
+        *output_flags, "pipe:1",
+    ]
+
+def _decode_with_pydub(audio_data: bytes) -> np.ndarray:
+    """
+    Fallback decoder for containers ffmpeg cannot read from a pipe (e.g. MP4 with
+    the index at the end). Converts the pydub segment to float32 samples in memory.
+    """
+    try:
+        audio_segment = AudioSegment.from_file(io.BytesIO(audio_data))
+    except Exception as e: # Catch pydub specific errors (e.g., ffmpeg not found)
+        if "ffmpeg" in str(e).lower() or "Couldn't find execution environment" in str(e):
+            raise RuntimeError("ffmpeg not found or not configured correctly. Cannot process audio.") from e
+        raise ValueError(f"Failed to process audio data with pydub: {e}") from e
+    audio_segment = audio_segment.set_channels(1).set_frame_rate(TARGET_SAMPLE_RATE)
+    samples = np.array(audio_segment.get_array_of_samples(), dtype=np.float32)
+    return samples / float(1 << (8 * audio_segment.sample_width - 1))
+
+# --- End In-memory audio decoding ---
+
+
+# --- Silence trimming ---
+def configure_vad(**settings):
+    """Enables energy-based silence trimming with the given EnergyVAD settings (none given = disabled)."""
+    global _vad
+    _vad = EnergyVAD(sample_rate=TARGET_SAMPLE_RATE, **settings) if settings else None
+
+def trim_silence(samples: np.ndarray) -> np.ndarray:
+    """
+    Drops leading/trailing silence (and long pauses, if configured) before inference,
+    since inference cost scales with audio length. Returns an empty array only if no
+    frame is above the VAD's absolute threshold. No-op when VAD is disabled.
+    """
+    if _vad is None:
+        return samples
+    with metrics.timed("asr_vad"):
+        result = _vad.trim(samples)
+    logger.debug(f"VAD removed {result.removed_seconds:.2f}s of {result.input_seconds:.2f}s "
+                 f"(leading {result.leading_seconds:.2f}s, trailing {result.trailing_seconds:.2f}s, pauses {result.compacted_seconds:.2f}s)")
+    return result.samples
+
+def _observe_audio(input_samples: int, inference_input_samples: int, transcribed_samples: int):
+    """Reports audio received, dropped by VAD and sent to the model for one transcription."""
+    removed_seconds = (inference_input_samples - transcribed_samples) / TARGET_SAMPLE_RATE
+    metrics.ASR_AUDIO_SECONDS.observe(input_samples / TARGET_SAMPLE_RATE, kind="input")
+    metrics.ASR_AUDIO_SECONDS.observe(removed_seconds, kind="removed")
+    metrics.ASR_AUDIO_SECONDS.observe(transcribed_samples / TARGET_SAMPLE_RATE, kind="transcribed")
+    if _vad is not None:
+        logger.info(f"VAD removed {removed_seconds:.2f}s of {input_samples / TARGET_SAMPLE_RATE:.2f}s of audio")
+# --- End Silence trimming ---
+
+
+# --- Dynamic micro-batching ---
+class _PendingTranscription:
+    """One queued transcription request waiting for a batch slot."""
+    __slots__ = ("samples", "future", "queued_at", "started_at", "inference_seconds")
+
+    def __init__(self, samples: np.ndarray, future: asyncio.Future):
+        self.samples = samples
+        self.future = future
+        self.queued_at = time.perf_counter()
+        self.started_at: float | None = None  # When its batch's inference began
+        self.inference_seconds: float | None = None
+
+
+class TranscriptionBatcher:
+    """
+    Collects transcription requests arriving within a short window and runs them
+    through the model as one batched `transcribe` call.
+
+    A single consumer task drains the queue, so at most one inference is running
+    against the model at any time; requests that arrive while a batch is running
+    simply accumulate and form the next batch.
+
+    Args:
+        window_ms: How long to wait for more requests after the first one arrives.
+        max_batch_size: Maximum number of clips per batch.
+        max_batch_seconds: Maximum total audio duration per batch.
+    """
+
+    def __init__(self, window_ms: float = 30.0, max_batch_size: int = 8, max_batch_seconds: float = 120.0):
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_samples = int(max_batch_seconds * TARGET_SAMPLE_RATE)
+        self._queue: asyncio.Queue[_PendingTranscription] | None = None
+        self._task: asyncio.Task | None = None
+        self._carry_over: _PendingTranscription | None = None # Request that didn't fit in the previous batch
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Starts the consumer task on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="asr-batcher")
+        logger.info(f"ASR batcher started (window={self.window * 1000:.0f}ms, max_batch_size={self.max_batch_size}, max_batch_seconds={self.max_batch_samples / TARGET_SAMPLE_RATE:.0f}).")
+
+    async def stop(self):
+        """Stops the consumer task and fails any requests still waiting."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        pending = [self._carry_over] if self._carry_over else []
+        self._carry_over = None
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for item in pending:
+            if not item.future.done():
+                item.future.set_exception(RuntimeError("ASR batcher stopped."))
+        logger.info("ASR batcher stopped.")
+
+    async def submit(self, samples: np.ndarray) -> str:
+        """Queues one clip (16kHz mono float32) and waits for its transcript."""
+        if not self.running:
+            raise RuntimeError("ASR batcher is not running.")
+        future = asyncio.get_running_loop().create_future()
+        item = _PendingTranscription(samples, future)
+        await self._queue.put(item)
+        try:
+            return await future
+        finally:
+            # Recorded here, in the caller's context, so they show up in its Server-Timing header
+            if item.started_at is not None:
+                metrics.record_stage("asr_queue", item.started_at - item.queued_at)
+            if item.inference_seconds is not None:
+                metrics.record_stage("asr_inference", item.inference_seconds)
+
+    async def _next_batch(self) -> list[_PendingTranscription]:
+        """Waits for a first request, then gathers more until the window, size or duration limit is hit."""
+        loop = asyncio.get_running_loop()
+        first = self._carry_over or await self._queue.get()
+        self._carry_over = None
+        batch = [first]
+        total_samples = first.samples.size
+        deadline = loop.time() + self.window
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if total_samples + item.samples.size > self.max_batch_samples:
+                self._carry_over = item # Goes first in the next batch
+                break
+            batch.append(item)
+            total_samples += item.samples.size
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            # Drop requests whose callers already gave up (e.g. client disconnected)
+            batch = [item for item in batch if not item.future.done()]
+            if not batch:
+                continue
+
+            audio_seconds = sum(item.samples.size for item in batch) / TARGET_SAMPLE_RATE
+            logger.info(f"Running batched NeMo transcription: {len(batch)} clip(s), {audio_seconds:.2f}s of audio.")
+            started = time.perf_counter()
+            for item in batch:
+                item.started_at = started
+            try:
+                results = await asyncio.to_thread(_transcribe_batch, _asr_model, [item.samples for item in batch])
+                elapsed = time.perf_counter() - started
+                for item in batch:
+                    item.inference_seconds = elapsed
+                if not isinstance(results, (list, tuple)) or len(results) != len(batch):
+                    raise RuntimeError(f"Expected {len(batch)} transcription results, got: {results!r}"[:300])
+                for item, result in zip(batch, results):
+                    if not item.future.done():
+                        item.future.set_result(_result_text(result))
+            except Exception as e:
+                logger.error(f"Batched transcription failed: {e}", exc_info=True)
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+
+
+_batcher: TranscriptionBatcher | None = None
+
+def start_batcher(window_ms: float = 30.0, max_batch_size: int = 8, max_batch_seconds: float = 120.0):
+    """Creates and starts the module-level batcher. Must be called from the server's event loop."""
+    global _batcher
+    if _batcher is None or not _batcher.running:
+        _batcher = TranscriptionBatcher(window_ms, max_batch_size, max_batch_seconds)
+        _batcher.start()
+
+async def stop_batcher():
+    """Stops the module-level batcher, if running."""
+    global _batcher
+    if _batcher is not None:
+        await _batcher.stop()
+        _batcher = None
+# --- End Dynamic micro-batching ---
+
+
+async def transcribe_samples(samples: np.ndarray) -> str:
+    """
+    Transcribes 16kHz mono float32 samples. Goes to the ASR worker process if one
+    is configured, through the batcher when it is running, and otherwise calls the
+    model directly (e.g. when used outside the server).
+    """
+    if _remote_worker is not None:
+        with metrics.timed("asr_worker"): # Queueing and inference happen in the worker process
+            return await _remote_worker.transcribe(samples)
+
+    if _asr_model is None:
+        logger.error("ASR model is not loaded. Cannot transcribe.")
+        raise RuntimeError(unavailable_reason())
+
+    if _batcher is not None and _batcher.running:
+        return await _batcher.submit(samples)
+
+    with metrics.timed("asr_inference"):
+        transcription_result = await asyncio.to_thread(_transcribe_batch, _asr_model, [samples])
+    if transcription_result and isinstance(transcription_result, (list, tuple)):
+        return _result_text(transcription_result[0])
+    logger.warning(f"Transcription result was empty or invalid: {transcription_result}")
+    return ""
 
-# --- NEW transcribe_audio_data using pydub ---
-async def transcribe_audio_data(audio_data: bytes) -> str:
+
+async def transcribe_audio_file(source) -> str:
     """
-    Transcribes raw audio bytes using the loaded Parakeet model.
-    Uses pydub (requires ffmpeg) to handle initial format conversion,
-    then converts to 16kHz mono WAV for NeMo.
+    Transcribes an audio file using the loaded Parakeet model.
+    Decodes in memory to a 16kHz mono float32 array (ffmpeg via a pipe) and
+    passes that array straight to NeMo, so no temporary files are involved.
+    Concurrent calls are grouped into batched forward passes by the batcher.
+
+    Recordings longer than the long-audio threshold are decoded incrementally and
+    transcribed as overlapping windows (see _transcribe_long_audio), so memory is
+    bounded by the window size rather than by the recording length.
 
     Args:
-        audio_data: Raw bytes of the audio file (e.g., webm/opus from browser).
+        source: Binary file-like object with the encoded audio (e.g. UploadFile.file).
 
     Returns:
         The transcribed text string.
 
     Raises:
         RuntimeError: If the ASR model is not loaded or ffmpeg is missing.
-        Exception: If any error occurs during audio processing or transcription.
+        ValueError: If the audio data cannot be decoded.
+        Exception: If any other error occurs during transcription.
     """
-    if _asr_model is None:
+    if not is_ready():
         logger.error("ASR model is not loaded. Cannot transcribe.")
-        raise RuntimeError("ASR model not available. Please ensure it loaded correctly on startup.")
+        raise RuntimeError(unavailable_reason())
 
-    temp_wav_path = None
+    # --- Step 1: Decode to 16kHz mono float32 samples (Run in thread pool) ---
+    threshold_samples = int(_long_audio["threshold_seconds"] * TARGET_SAMPLE_RATE)
+    reader = _FfmpegPcmReader(source)
     try:
-        # --- Step 1: Load audio bytes using pydub ---
-        # Use io.BytesIO to treat the bytes like a file
-        audio_io = io.BytesIO(audio_data)
-        try:
-             # Let pydub detect format (needs ffmpeg for webm/opus)
-            audio_segment = AudioSegment.from_file(audio_io)
-            logger.debug(f"pydub loaded audio: SR={audio_segment.frame_rate}, Channels={audio_segment.channels}, Duration={audio_segment.duration_seconds:.2f}s")
-        except Exception as e: # Catch pydub specific errors (e.g., ffmpeg not found)
-             logger.error(f"pydub failed to load audio from bytes. Is ffmpeg installed and in PATH? Error: {e}", exc_info=True)
-             if "ffmpeg" in str(e).lower() or "Couldn't find execution environment" in str(e):
-                 raise RuntimeError("ffmpeg not found or not configured correctly. Cannot process audio.") from e
-             else:
-                 raise ValueError(f"Failed to process audio data with pydub: {e}") from e
-
-
-        # --- Step 2: Convert to 16kHz Mono using pydub ---
-        audio_segment = audio_segment.set_channels(1) # Convert to mono
-        audio_segment = audio_segment.set_frame_rate(TARGET_SAMPLE_RATE) # Resample to 16kHz
-        logger.debug(f"pydub converted to: SR={audio_segment.frame_rate}, Channels={audio_segment.channels}")
-
-        # --- Step 3: Export processed audio to a temporary WAV file ---
-        # Create a temporary file path for the WAV output
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_wav:
-            temp_wav_path = tmp_wav.name
-
-        # Export the pydub segment to the WAV file path
-        # Use export method which returns the file handle, ensure it's closed
-        exported_file = audio_segment.export(temp_wav_path, format="wav")
-        exported_file.close() # Explicitly close the handle returned by export
-        logger.debug(f"Processed audio exported to temp WAV file: {temp_wav_path}")
-
-
-        # --- Step 4: Transcribe using the WAV file path (Run in thread pool) ---
-        logger.info(f"Starting NeMo transcription for {temp_wav_path}...")
-        transcription_result = await asyncio.to_thread(
-             _asr_model.transcribe, [temp_wav_path], batch_size=1
-        )
-        logger.info("NeMo transcription finished.")
+        with metrics.timed("asr_decode"): # ffmpeg decode + downmix + resample in one pass
+            samples = await asyncio.to_thread(reader.read, threshold_samples + 1)
+        if samples.size > threshold_samples:
+            return await _transcribe_long_audio(reader, samples)
+    except ValueError as e:
+        if reader.samples_read:
+            raise
+        # Containers ffmpeg cannot read from a pipe (e.g. MP4 with the index at the end)
+        logger.warning(f"ffmpeg pipe decode failed, retrying with pydub: {e}")
+        source.seek(0)
+        with metrics.timed("asr_decode"):
+            samples = await asyncio.to_thread(_decode_with_pydub, source.read())
+        if samples.size > threshold_samples:
+            return await _transcribe_long_audio(_ArrayPcmReader(samples[threshold_samples + 1:]), samples[:threshold_samples + 1])
+    finally:
+        reader.close()
+    if samples.size == 0:
+        raise ValueError("Decoded audio contains no samples.")
 
-        # --- Step 5: Extract text ---
-        if transcription_result and isinstance(transcription_result, (list, tuple)) and len(transcription_result) > 0:
-            first_result = transcription_result[0]
-            text = first_result if isinstance(first_result, str) else getattr(first_result, 'text', str(first_result))
-            logger.debug(f"Raw transcription result: '{text[:100]}...'")
-            return text.strip() if text else ""
-        else:
-             logger.warning(f"Transcription result was empty or invalid: {transcription_result}")
-             return ""
+    trimmed = await asyncio.to_thread(trim_silence, samples)
+    _observe_audio(samples.size, samples.size, trimmed.size)
+    if trimmed.size == 0:
+        logger.info("No speech detected; skipping inference.")
+        return ""
+
+    try:
+        # --- Step 2: Transcribe the in-memory samples (batched, in thread pool) ---
+        logger.info(f"Queueing NeMo transcription for {trimmed.size / TARGET_SAMPLE_RATE:.2f}s of audio...")
+        text = await transcribe_samples(trimmed)
+        logger.info("NeMo transcription finished.")
+        return text
 
     except Exception as e:
         # Catch any other unexpected errors during the process
-        logger.error(f"Error during audio processing/transcription: {e}", exc_info=True)
+        logger.error(f"Error during transcription: {e}", exc_info=True)
         raise Exception(f"Transcription failed: {e}") from e
 
+
+# --- Long-audio chunked transcription ---
+DEFAULT_LONG_AUDIO_SETTINGS = {
+    "threshold_seconds": 60.0, # Recordings longer than this are split into windows
+    "window_seconds": 30.0,
+    "overlap_seconds": 1.0, # Audio shared by neighbouring windows, centred on the pause they are cut at
+    "max_in_flight": 4, # Windows decoded and awaiting transcription at once (bounds memory)
+}
+_long_audio = dict(DEFAULT_LONG_AUDIO_SETTINGS)
+
+def configure_long_audio(**settings):
+    """Sets the long-audio threshold, window/overlap lengths and parallelism (unknown keys raise)."""
+    unknown = set(settings) - set(DEFAULT_LONG_AUDIO_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown long-audio setting(s): {', '.join(sorted(unknown))}")
+    merged = {**DEFAULT_LONG_AUDIO_SETTINGS, **settings}
+    if merged["window_seconds"] <= 2 * merged["overlap_seconds"] or merged["max_in_flight"] < 1:
+        raise ValueError("Long-audio window must be longer than twice the overlap, and max_in_flight at least 1.")
+    _long_audio.update(merged)
+
+
+class _FfmpegPcmReader:
+    """
+    Decodes a file-like object to 16kHz mono float32 samples a block at a time.
+    A feeder thread copies the source into ffmpeg's stdin while read() pulls
+    decoded samples from stdout, so neither side is held in memory in full.
+    (Blocking pipes and threads rather than asyncio subprocesses, which the
+    Windows selector event loop doesn't support.)
+    """
+    FEED_BLOCK_BYTES = 64 * 1024
+
+    def __init__(self, source):
+        try:
+            self._process = subprocess.Popen(_ffmpeg_pcm_command(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError as e:
+            raise RuntimeError("ffmpeg not found or not configured correctly. Cannot process audio.") from e
+        self.samples_read = 0
+        self._stderr = b""
+        self._feeder = threading.Thread(target=self._feed, args=(source,), name="ffmpeg-feed", daemon=True)
+        self._stderr_reader = threading.Thread(target=self._read_stderr, name="ffmpeg-stderr", daemon=True)
+        self._feeder.start()
+        self._stderr_reader.start()
+
+    def _feed(self, source):
+        try:
+            while block := source.read(self.FEED_BLOCK_BYTES):
+                self._process.stdin.write(block)
+        except (BrokenPipeError, OSError, ValueError):
+            pass # ffmpeg exited (or was closed) early; read() reports its exit status
+        finally:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+
+    def _read_stderr(self):
+        self._stderr = self._process.stderr.read()
+
+    def read(self, n_samples: int) -> np.ndarray:
+        """Blocks until `n_samples` are decoded; returns fewer only at the end of the stream."""
+        data = self._process.stdout.read(n_samples * 4)
+        if len(data) < n_samples * 4:
+            returncode = self._process.wait()
+            self._stderr_reader.join()
+            self._feeder.join() # Done with the source (it may be re-read after a failure)
+            if returncode != 0:
+                stderr = self._stderr.decode(errors="replace").strip()
+                raise ValueError(f"ffmpeg failed to decode audio: {stderr[-300:]}")
+        samples = np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+        self.samples_read += samples.size
+        return samples
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._process.stdout.close()
+
+
+class _ArrayPcmReader:
+    """read()-compatible view of already decoded samples (pydub fallback)."""
+
+    def __init__(self, samples: np.ndarray):
+        self._samples = samples
+        self.samples_read = 0
+
+    def read(self, n_samples: int) -> np.ndarray:
+        chunk = self._samples[self.samples_read:self.samples_read + n_samples]
+        self.samples_read += chunk.size
+        return chunk
+
+    def close(self):
+        self._samples = self._samples[:0]
+
+
+async def _transcribe_long_audio(reader, buffered: np.ndarray) -> str:
+    """
+    Transcribes a long recording as overlapping windows of `window_seconds`.
+
+    Each window is cut at the quietest point of its last quarter and the next one
+    starts `overlap_seconds` earlier, so words at the boundary appear in both and
+    are removed again by merge_transcripts(). Up to `max_in_flight` windows are
+    transcribed concurrently (grouped into batched forward passes by the batcher);
+    decoding pauses while they are all busy, so at most that many windows plus
+    the one being decoded are held in memory.
+    """
+    window = int(_long_audio["window_seconds"] * TARGET_SAMPLE_RATE)
+    half_overlap = int(_long_audio["overlap_seconds"] * TARGET_SAMPLE_RATE) // 2
+    in_flight = asyncio.Semaphore(int(_long_audio["max_in_flight"]))
+    totals = {"input": buffered.size, "windows": 0, "transcribed": 0}
+    tasks: list[asyncio.Task] = []
+
+    async def transcribe_window(samples: np.ndarray) -> str:
+        try:
+            trimmed = await asyncio.to_thread(trim_silence, samples)
+            totals["windows"] += samples.size
+            totals["transcribed"] += trimmed.size
+            return await transcribe_samples(trimmed) if trimmed.size else ""
+        finally:
+            in_flight.release()
+
+    def submit(samples: np.ndarray):
+        tasks.append(asyncio.create_task(transcribe_window(samples)))
+
+    logger.info(f"Long recording: transcribing in {_long_audio['window_seconds']:.0f}s windows, "
+                f"up to {_long_audio['max_in_flight']} at a time...")
+    try:
+        end_of_stream = False
+        while True:
+            if not end_of_stream and buffered.size < window:
+                wanted = window - buffered.size
+                with metrics.timed("asr_decode"):
+                    more = await asyncio.to_thread(reader.read, wanted)
+                end_of_stream = more.size < wanted
+                totals["input"] += more.size
+                buffered = np.concatenate((buffered, more))
+            await in_flight.acquire()
+            if end_of_stream and buffered.size <= window:
+                # Final window; skip it if it only holds the previous window's overlap
+                if buffered.size > 2 * half_overlap or not tasks:
+                    submit(buffered)
+                else:
+                    in_flight.release()
+                break
+            cut = _find_split_point(buffered[:window], search_from=window * 3 // 4)
+            submit(buffered[:cut + half_overlap].copy())
+            buffered = buffered[cut - half_overlap:].copy()
+        texts = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
     finally:
-        # --- Step 6: Clean up the temporary WAV file ---
-        if temp_wav_path and os.path.exists(temp_wav_path):
+        reader.close()
+
+    _observe_audio(totals["input"], totals["windows"], totals["transcribed"])
+    logger.info(f"Long recording: {totals['input'] / TARGET_SAMPLE_RATE:.1f}s transcribed as {len(tasks)} windows.")
+    return merge_transcripts(texts)
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+def merge_transcripts(texts: list[str], max_overlap_words: int = 16) -> str:
+    """
+    Joins the transcripts of consecutive overlapping windows, dropping the words
+    repeated at each boundary: the longest run of up to `max_overlap_words` that
+    ends one transcript and starts the next (ignoring case and punctuation).
+    """
+    merged: list[str] = []
+    for text in texts:
+        words = text.split()
+        previous = [_normalize_word(w) for w in merged[-max_overlap_words:]]
+        upcoming = [_normalize_word(w) for w in words[:max_overlap_words]]
+        repeated = next((k for k in range(min(len(previous), len(upcoming)), 0, -1)
+                         if previous[-k:] == upcoming[:k]), 0)
+        merged.extend(words[repeated:])
+    return " ".join(merged)
+# --- End Long-audio chunked transcription ---
+
+
+# --- Streaming transcription ---
+STREAM_INPUT_FORMATS = ("webm", "pcm_s16le", "pcm_f32le")
+_SPLIT_FRAME_SAMPLES = int(0.02 * TARGET_SAMPLE_RATE) # 20ms energy frames when looking for a split point
+
+def _find_split_point(samples: np.ndarray, search_from: int | None = None) -> int:
+    """
+    Returns the index of the quietest 20ms frame after `search_from` (default: the
+    second half of `samples`), so chunks end in a pause rather than in the middle of a word.
+    """
+    half = samples.size // 2 if search_from is None else search_from
+    tail = samples[half:]
+    n_frames = tail.size // _SPLIT_FRAME_SAMPLES
+    if n_frames == 0:
+        return samples.size
+    frames = tail[:n_frames * _SPLIT_FRAME_SAMPLES].reshape(n_frames, _SPLIT_FRAME_SAMPLES)
+    quietest = int(np.argmin(np.mean(frames * frames, axis=1)))
+    return half + quietest * _SPLIT_FRAME_SAMPLES + _SPLIT_FRAME_SAMPLES // 2
+
+
+class _LinearResampler:
+    """Streaming linear-interpolation resampler; state carries across chunks so chunk boundaries are seamless."""
+
+    def __init__(self, from_rate: int, to_rate: int):
+        self.step = from_rate / to_rate # Input samples per output sample
+        self._consumed = 0 # Input samples seen before the current chunk
+        self._emitted = 0  # Output samples produced so far
+        self._previous: float | None = None # Last input sample of the previous chunk
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if samples.size == 0:
+            return samples
+        if self._previous is None:
+            first, values = 0, samples
+        else:
+            first, values = self._consumed - 1, np.concatenate(([self._previous], samples))
+        last = self._consumed + samples.size - 1
+        n_out = max(0, int(last // self.step) + 1 - self._emitted)
+        positions = (self._emitted + np.arange(n_out)) * self.step
+        out = np.interp(positions, np.arange(first, first + values.size), values).astype(np.float32)
+        self._emitted += n_out
+        self._consumed += samples.size
+        self._previous = float(samples[-1])
+        return out
+
+
+class _FfmpegStreamDecoder:
+    """
+    One ffmpeg process per stream of container chunks (e.g. MediaRecorder WebM).
+    A writer thread feeds chunks to stdin as they arrive and a reader thread
+    collects decoded samples from stdout, so every chunk is decoded exactly once.
+    """
+    MAX_QUEUED_BYTES = 8 * 1024 * 1024 # Encoded audio not yet handed to ffmpeg
+
+    def __init__(self):
+        try:
+            self._process = subprocess.Popen(_ffmpeg_pcm_command(low_latency=True), stdin=subprocess.PIPE,
+                                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError as e:
+            raise RuntimeError("ffmpeg not found or not configured correctly. Cannot process audio.") from e
+        self._chunks: queue.Queue[bytes | None] = queue.Queue()
+        self._queued_bytes = 0
+        self._decoded: list[np.ndarray] = []
+        self._decoded_total = 0
+        self._lock = threading.Lock()
+        self._stderr = b""
+        self._threads = [
+            threading.Thread(target=self._write, name="ffmpeg-stream-feed", daemon=True),
+            threading.Thread(target=self._read, name="ffmpeg-stream-read", daemon=True),
+            threading.Thread(target=self._read_stderr, name="ffmpeg-stream-stderr", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _write(self):
+        try:
+            while (chunk := self._chunks.get()) is not None:
+                with self._lock:
+                    self._queued_bytes -= len(chunk)
+                self._process.stdin.write(chunk)
+                self._process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            pass # ffmpeg exited (or was closed) early; finish() reports its exit status
+        finally:
             try:
-                os.remove(temp_wav_path)
-                logger.debug(f"Cleaned up temporary WAV file: {temp_wav_path}")
-            except OSError as e:
-                logger.error(f"Error deleting temporary WAV file {temp_wav_path}: {e}")
\ No newline at end of file
+                self._process.stdin.close()
+            except OSError:
+                pass
+
+    def _read(self):
+        remainder = b""
+        while data := self._process.stdout.read1(64 * 1024):
+            data = remainder + data
+            usable = len(data) - len(data) % 4
+            remainder = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=np.float32)
+            with self._lock:
+                self._decoded.append(samples)
+                self._decoded_total += samples.size
+
+    def _read_stderr(self):
+        self._stderr = self._process.stderr.read()
+
+    def write(self, data: bytes):
+        with self._lock:
+            if self._queued_bytes + len(data) > self.MAX_QUEUED_BYTES:
+                raise ValueError("Streaming audio buffer limit exceeded; ffmpeg is not keeping up.")
+            self._queued_bytes += len(data)
+        self._chunks.put(bytes(data))
+
+    def take(self) -> np.ndarray:
+        """Returns (and forgets) the samples decoded since the last call."""
+        with self._lock:
+            decoded, self._decoded = self._decoded, []
+        return np.concatenate(decoded) if decoded else np.zeros(0, dtype=np.float32)
+
+    def finish(self) -> np.ndarray:
+        """Blocks until ffmpeg has decoded everything written; returns the remaining samples."""
+        self._chunks.put(None)
+        for thread in self._threads:
+            thread.join()
+        returncode = self._process.wait()
+        if returncode != 0 and self._decoded_total == 0:
+            stderr = self._stderr.decode(errors="replace").strip()
+            raise ValueError(f"ffmpeg failed to decode audio: {stderr[-300:]}")
+        return self.take()
+
+    def close(self):
+        self._chunks.put(None)
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+
+
+class StreamingTranscriber:
+    """
+    Incremental transcription of audio that arrives in chunks while the user speaks.
+
+    Incoming audio is decoded once, as it arrives (a persistent ffmpeg process for
+    containers, direct conversion for raw PCM), into a buffer of not-yet-committed
+    samples. Once that exceeds `chunk_seconds` it is cut at the quietest point near
+    the end of the chunk, transcribed once, committed and dropped from the buffer.
+    Interim hypotheses are the committed text plus a transcript of the short
+    uncommitted tail, so neither interim results nor the final transcript touch
+    more than about one chunk of audio, and memory does not grow with the session.
+
+    Args:
+        input_format: "webm" (any ffmpeg-readable container, chunks concatenated as
+            produced by MediaRecorder), "pcm_s16le" or "pcm_f32le" (raw mono PCM).
+        sample_rate: Sample rate of raw PCM input; resampled to 16kHz if different.
+        chunk_seconds: Length of audio committed per inference.
+    """
+
+    MIN_TAIL_SAMPLES = int(0.3 * TARGET_SAMPLE_RATE) # Tails shorter than this are not worth an inference
+    MAX_PENDING_SECONDS = 60.0 # Uncommitted audio allowed to pile up between interim results
+
+    def __init__(self, input_format: str = "webm", sample_rate: int = TARGET_SAMPLE_RATE, chunk_seconds: float = 4.0):
+        if input_format not in STREAM_INPUT_FORMATS:
+            raise ValueError(f"Unsupported stream format '{input_format}'. Expected one of {STREAM_INPUT_FORMATS}.")
+        if sample_rate <= 0:
+            raise ValueError("sample_rate must be positive.")
+        self.input_format = input_format
+        self.sample_rate = sample_rate
+        self.chunk_samples = max(int(chunk_seconds * TARGET_SAMPLE_RATE), 2 * self.MIN_TAIL_SAMPLES)
+        self.max_pending_samples = max(int(self.MAX_PENDING_SECONDS * TARGET_SAMPLE_RATE), 4 * self.chunk_samples)
+        self._pending = np.zeros(0, dtype=np.float32) # Decoded 16kHz samples not yet committed
+        self._pcm_remainder = b"" # Trailing bytes of an incomplete raw PCM sample
+        self._committed_text: list[str] = []
+        self._decoder = _FfmpegStreamDecoder() if input_format == "webm" else None
+        self._resampler = (_LinearResampler(sample_rate, TARGET_SAMPLE_RATE)
+                           if self._decoder is None and sample_rate != TARGET_SAMPLE_RATE else None)
+
+    def add_chunk(self, data: bytes):
+        """Appends a chunk of audio bytes received from the client."""
+        if self._decoder is not None:
+            self._decoder.write(data)
+            return
+        data = self._pcm_remainder + data
+        width = 2 if self.input_format == "pcm_s16le" else 4
+        usable = len(data) - len(data) % width
+        self._pcm_remainder = data[usable:]
+        if self.input_format == "pcm_s16le":
+            samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        else:
+            samples = np.frombuffer(data[:usable], dtype="<f4").astype(np.float32)
+        if self._resampler is not None:
+            samples = self._resampler.process(samples)
+        self._append(samples)
+
+    def _append(self, samples: np.ndarray):
+        if samples.size:
+            self._pending = np.concatenate((self._pending, samples))
+        if self._pending.size > self.max_pending_samples:
+            raise ValueError(f"More than {self.max_pending_samples / TARGET_SAMPLE_RATE:.0f}s of audio is waiting "
+                             "to be transcribed; the stream is arriving faster than it can be processed.")
+
+    async def _commit_full_chunks(self):
+        """Transcribes and commits every complete chunk of uncommitted audio."""
+        while self._pending.size >= self.chunk_samples:
+            chunk = self._pending[:self.chunk_samples]
+            split = _find_split_point(chunk)
+            text = await transcribe_samples(chunk[:split])
+            if text:
+                self._committed_text.append(text)
+            self._pending = self._pending[split:]
+            logger.debug(f"Streaming ASR committed {split / TARGET_SAMPLE_RATE:.2f}s: '{text[:50]}'")
+
+    async def _hypothesis(self) -> str:
+        await self._commit_full_chunks()
+        parts = list(self._committed_text)
+        if self._pending.size >= self.MIN_TAIL_SAMPLES:
+            tail_text = await transcribe_samples(self._pending)
+            if tail_text:
+                parts.append(tail_text)
+        return " ".join(parts)
+
+    async def partial(self) -> str | None:
+        """Returns an interim hypothesis for the audio so far, or None if nothing is decodable yet."""
+        if self._decoder is not None:
+            self._append(self._decoder.take())
+        if not self._committed_text and self._pending.size < self.MIN_TAIL_SAMPLES:
+            return None
+        return await self._hypothesis()
+
+    async def finish(self) -> str:
+        """Transcribes the remaining audio and returns the final transcript."""
+        if self._decoder is not None:
+            with metrics.timed("asr_stream_decode"): # Decoding whatever ffmpeg still had buffered
+                self._append(await asyncio.to_thread(self._decoder.finish))
+        return await self._hypothesis()
+
+    def close(self):
+        """Stops the decoder process (safe to call more than once)."""
+        if self._decoder is not None:
+            self._decoder.close()
+# --- End Streaming transcription ---
+
+
+def _result_text(result) -> str:
+    """Pulls the text out of a single NeMo transcription result (str or Hypothesis)."""
+    text = result if isinstance(result, str) else getattr(result, 'text', str(result))
+    logger.debug(f"Raw transcription result: '{(text or '')[:100]}...'")
+    return text.strip() if text else ""
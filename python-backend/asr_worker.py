@@ -0,0 +1,350 @@
+# python-backend/asr_worker.py
+"""
+Out-of-process ASR worker.
+
+Owns the single Parakeet model (and the transcription batcher) so that several
+uvicorn workers can share one copy of it. Web processes connect over a local
+IPC channel (Unix socket, or a named pipe on Windows) and pass audio through
+shared memory; only small control messages travel over the socket.
+
+Run standalone with `python asr_worker.py`, or let `python server.py` spawn it
+when `[ASR] Mode = worker` is set in config.ini.
+
+multiprocessing connections unpickle every message, so the channel must only be
+reachable by this user: the auth key is random per run when server.py spawns the
+worker (passed to it and the uvicorn workers via the environment), Unix sockets
+live in a directory only this user can access, and TCP is limited to loopback.
+"""
+
+import asyncio
+import configparser
+import ipaddress
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import asr_client
+
+logger = logging.getLogger(__name__)
+
+AUTHKEY_ENV = "AIFRED_ASR_AUTHKEY" # Hex auth key, set by server.py for the worker it spawns
+PUBLISHED_AUTHKEYS = {"aifred-asr"} # Keys that shipped in config.ini; anyone can read them
+
+
+def resolve_authkey(configured: str | None) -> bytes | None:
+    """
+    The IPC auth key: AIFRED_ASR_AUTHKEY if set, else the configured [ASR] WorkerAuthKey.
+    Returns None if neither is set or the configured key is a published default.
+    """
+    from_env = os.environ.get(AUTHKEY_ENV, "").strip()
+    if from_env:
+        return bytes.fromhex(from_env)
+    configured = (configured or "").strip()
+    if not configured or configured in PUBLISHED_AUTHKEYS:
+        return None
+    return configured.encode()
+
+
+def default_worker_address() -> str:
+    """Named pipe on Windows, elsewhere a Unix domain socket in a per-user directory (see ensure_private_dir)."""
+    if sys.platform == "win32":
+        return r"\\.\pipe\aifred-asr"
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"aifred-{os.getuid()}", "asr.sock")
+
+
+def parse_worker_address(value: str | None) -> str | tuple[str, int]:
+    """
+    Accepts a socket/pipe path or "host:port" (TCP, loopback only); empty means the platform default.
+
+    Raises:
+        ValueError: If a TCP host is not a loopback address.
+    """
+    value = (value or "").strip()
+    if not value:
+        return default_worker_address()
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit() and not value.startswith("\\\\"):
+        host = host.strip("[]") or "127.0.0.1"
+        try:
+            loopback = host == "localhost" or ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f"ASR worker TCP address must be on loopback (127.0.0.1, ::1 or localhost), got '{host}'")
+        return (host, int(port))
+    return value
+
+
+def ensure_private_dir(address, create: bool = False):
+    """
+    Checks that a Unix socket address lives in a directory owned by this user and
+    inaccessible to others (creating it with mode 0700 if asked), so nobody else can
+    connect to, or pre-create, the socket. No-op for TCP addresses and named pipes.
+
+    Raises:
+        RuntimeError: If the directory is missing, not owned by this user, or group/world accessible.
+    """
+    if not isinstance(address, str) or sys.platform == "win32":
+        return
+    directory = os.path.dirname(os.path.abspath(address))
+    if create:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    try:
+        info = os.lstat(directory)
+    except FileNotFoundError:
+        raise RuntimeError(f"ASR worker socket directory {directory} does not exist") from None
+    if not os.path.isdir(directory) or os.path.islink(directory) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"ASR worker socket directory {directory} must be a directory owned by this user "
+                           f"with mode 0700 (found mode {info.st_mode & 0o777:o}, owner uid {info.st_uid})")
+
+
+def read_inference_settings(config: configparser.ConfigParser) -> dict:
+    """
+    Reads the [ASR] inference profile keys (device, threads, quantization, ONNX backend)
+    for asr_client.configure_inference.
+
+    Raises:
+        ValueError: If a value is invalid.
+    """
+    settings = {
+        "device": config.get('ASR', 'Device', fallback='auto').strip().lower(),
+        "threads": config.getint('ASR', 'Threads', fallback=0),
+        "interop_threads": config.getint('ASR', 'InteropThreads', fallback=0),
+        "quantization": config.get('ASR', 'Quantization', fallback='none').strip().lower(),
+        "inference_mode": config.getboolean('ASR', 'InferenceMode', fallback=True),
+        "backend": config.get('ASR', 'Backend', fallback='pytorch').strip().lower(),
+        "onnx_encoder_path": config.get('ASR', 'OnnxEncoderPath', fallback='').strip() or None,
+    }
+    for key, allowed in (("device", ("auto", "cpu", "cuda")), ("quantization", ("none", "int8")), ("backend", ("pytorch", "onnx"))):
+        if settings[key] not in allowed:
+            raise ValueError(f"[ASR] {key} must be one of {', '.join(allowed)}, got '{settings[key]}'")
+    path = settings["onnx_encoder_path"]
+    if path and not os.path.isabs(path):
+        settings["onnx_encoder_path"] = os.path.join(current_dir, path)
+    return settings
+
+
+def _read_shared_samples(name: str, n_samples: int) -> np.ndarray:
+    """Copies float32 samples out of a shared memory block created by the web process."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        if sys.platform != "win32":
+            # The creating process owns (and unlinks) the block; stop this process's
+            # resource tracker from also unlinking it at exit (CPython < 3.13 behaviour).
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return np.ndarray((n_samples,), dtype=np.float32, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+
+# --- Worker-side server ---
+def _handle_connection(conn: connection.Connection, loop: asyncio.AbstractEventLoop):
+    """Serves requests from one web-process connection until it closes."""
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            op = message.get("op")
+            if op == "status":
+                conn.send({"ok": True, "status": asr_client.get_asr_status()})
+            elif op == "transcribe":
+                try:
+                    samples = _read_shared_samples(message["shm"], message["samples"])
+                    future = asyncio.run_coroutine_threadsafe(asr_client.transcribe_samples(samples), loop)
+                    conn.send({"ok": True, "text": future.result()})
+                except ValueError as e:
+                    conn.send({"ok": False, "kind": "value", "error": str(e)})
+                except RuntimeError as e:
+                    conn.send({"ok": False, "kind": "runtime", "error": str(e)})
+                except Exception as e:
+                    logger.error(f"ASR worker transcription failed: {e}", exc_info=True)
+                    conn.send({"ok": False, "kind": "error", "error": str(e)})
+            else:
+                conn.send({"ok": False, "kind": "value", "error": f"Unknown op: {op!r}"})
+
+
+def _accept_loop(listener: connection.Listener, loop: asyncio.AbstractEventLoop):
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError:
+            return # Listener closed
+        except Exception as e:
+            logger.warning(f"Rejected ASR worker connection: {e}") # e.g. wrong authkey
+            continue
+        threading.Thread(target=_handle_connection, args=(conn, loop), name="asr-worker-conn", daemon=True).start()
+
+
+async def serve(address, authkey: bytes, warm_up: bool = True, batch_settings: dict | None = None):
+    """Loads the model, starts the batcher and serves IPC connections forever."""
+    ensure_private_dir(address, create=True)
+    if isinstance(address, str) and not address.startswith("\\\\") and os.path.exists(address):
+        os.remove(address) # Stale socket from a previous run
+    listener = connection.Listener(address, authkey=authkey)
+    logger.info(f"ASR worker listening on {address}")
+
+    asr_client.start_background_load(warm_up=warm_up)
+    asr_client.start_batcher(**(batch_settings or {}))
+    loop = asyncio.get_running_loop()
+    threading.Thread(target=_accept_loop, args=(listener, loop), name="asr-worker-accept", daemon=True).start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        listener.close()
+        await asr_client.stop_batcher()
+# --- End Worker-side server ---
+
+
+# --- Web-process client ---
+class ASRWorkerClient:
+    """
+    Client used by each uvicorn worker to reach the ASR worker process.
+
+    Keeps a small pool of IPC connections (a Connection is not safe for concurrent
+    use) and polls the worker's model status in the background so /api/status and
+    readiness checks never block on IPC.
+
+    Args:
+        address: Worker address as returned by parse_worker_address.
+        authkey: Shared secret for the multiprocessing connection handshake (None = not configured;
+            every request then fails with RuntimeError).
+        status_interval: Seconds between background status polls.
+    """
+
+    def __init__(self, address, authkey: bytes | None, status_interval: float = 2.0):
+        self.address = address
+        self.authkey = authkey
+        self.status_interval = status_interval
+        self._idle: queue.SimpleQueue[connection.Connection] = queue.SimpleQueue()
+        self._status = {"state": "unreachable", "progress": 0.0, "detail": "Not contacted yet.", "backend": "worker"}
+        self._task: asyncio.Task | None = None
+
+    def _request(self, message: dict) -> dict:
+        """Sends one message and waits for the reply (blocking; call via asyncio.to_thread)."""
+        for attempt in range(2): # A pooled connection may be stale if the worker restarted
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                if self.authkey is None:
+                    raise RuntimeError("No ASR worker auth key: set [ASR] WorkerAuthKey to a private value "
+                                       "or let server.py spawn the worker.")
+                try:
+                    ensure_private_dir(self.address)
+                    conn = connection.Client(self.address, authkey=self.authkey)
+                except (OSError, connection.AuthenticationError) as e:
+                    raise RuntimeError(f"ASR worker unavailable at {self.address}: {e}") from e
+            try:
+                conn.send(message)
+                reply = conn.recv()
+            except (EOFError, OSError) as e:
+                conn.close()
+                if attempt == 1:
+                    raise RuntimeError(f"Lost connection to ASR worker: {e}") from e
+                continue
+            self._idle.put(conn)
+            return reply
+
+    async def transcribe(self, samples: np.ndarray) -> str:
+        """Transcribes 16kHz mono float32 samples in the worker process."""
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(samples.nbytes, 1))
+        try:
+            np.ndarray(samples.shape, dtype=np.float32, buffer=shm.buf)[:] = samples
+            reply = await asyncio.to_thread(self._request, {"op": "transcribe", "shm": shm.name, "samples": samples.size})
+        finally:
+            shm.close()
+            shm.unlink()
+        if reply.get("ok"):
+            return reply["text"]
+        if reply.get("kind") == "value":
+            raise ValueError(reply["error"])
+        if reply.get("kind") == "runtime":
+            raise RuntimeError(reply["error"])
+        raise Exception(reply.get("error", "Unknown ASR worker error"))
+
+    async def refresh_status(self):
+        try:
+            reply = await asyncio.to_thread(self._request, {"op": "status"})
+            self._status = dict(reply["status"], backend="worker")
+        except RuntimeError as e:
+            self._status = {"state": "unreachable", "progress": 0.0, "detail": str(e), "backend": "worker"}
+
+    def get_status(self) -> dict:
+        return dict(self._status)
+
+    async def _status_loop(self):
+        while True:
+            await self.refresh_status()
+            await asyncio.sleep(self.status_interval)
+
+    def start(self):
+        """Starts background status polling on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._status_loop(), name="asr-worker-status")
+
+    async def stop(self):
+        """Stops status polling and closes pooled connections."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+# --- End Web-process client ---
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - [%(levelname)s] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    config = configparser.ConfigParser()
+    config.read(os.path.join(current_dir, 'config.ini'))
+    try:
+        worker_address = parse_worker_address(config.get('ASR', 'WorkerAddress', fallback=''))
+        worker_authkey = resolve_authkey(config.get('ASR', 'WorkerAuthKey', fallback=''))
+    except ValueError as e:
+        logger.error(f"Invalid ASR worker settings: {e}")
+        sys.exit(1)
+    if worker_authkey is None:
+        logger.error(f"Refusing to start without a private auth key: set [ASR] WorkerAuthKey to a random value "
+                     f"(not the published default) or {AUTHKEY_ENV}, or start the worker via server.py.")
+        sys.exit(1)
+    worker_batch_settings = {
+        "window_ms": config.getfloat('ASR', 'BatchWindowMs', fallback=30.0),
+        "max_batch_size": config.getint('ASR', 'MaxBatchSize', fallback=8),
+        "max_batch_seconds": config.getfloat('ASR', 'MaxBatchSeconds', fallback=120.0),
+    }
+    try:
+        asr_client.configure_inference(**read_inference_settings(config))
+    except ValueError as e:
+        logger.error(f"Invalid ASR inference settings in config.ini: {e}. Using defaults.")
+    try:
+        asyncio.run(serve(worker_address, worker_authkey, config.getboolean('ASR', 'WarmUp', fallback=True), worker_batch_settings))
+    except RuntimeError as e:
+        logger.error(f"ASR worker could not start: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        logger.info("ASR worker stopped.")
@@ -0,0 +1,186 @@
+# python-backend/bench/fake_ollama.py
+"""
+Local stand-in for Ollama, for benchmarking the backend without a GPU or real models.
+
+Implements /api/tags, /api/ps, /api/generate and /api/chat (streamed and not)
+with configurable model load time, prefill latency, token rate and parallelism,
+and reports Ollama-style timing stats so the backend's metrics work unchanged.
+
+    python bench/fake_ollama.py --port 11434 --prefill-ms 150 --tokens-per-second 40 --tokens 64
+
+Point [Ollama] ApiBaseUrl in config.ini at it (several instances on different
+ports can be listed to exercise multi-endpoint routing).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("the", "model", "answer", "is", "a", "quick", "local", "response", "with", "some", "tokens", "for", "testing")
+
+parser = argparse.ArgumentParser(description="Fake Ollama server for AIFred benchmarks.")
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=11434)
+parser.add_argument("--models", default="bench-model:latest,bench-vision:latest",
+                    help="Comma-separated model names to advertise in /api/tags.")
+parser.add_argument("--load-ms", type=float, default=0.0, help="One-off load time when a model is first used (or after keep_alive expiry).")
+parser.add_argument("--prefill-ms", type=float, default=100.0, help="Prompt evaluation time per request.")
+parser.add_argument("--prefill-ms-per-image", type=float, default=0.0, help="Extra prompt evaluation time per attached image.")
+parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Generation speed.")
+parser.add_argument("--tokens", type=int, default=32, help="Tokens generated per response.")
+parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- fraction applied to every latency (0.1 = 10%%).")
+parser.add_argument("--parallel", type=int, default=4, help="Concurrent generations (like OLLAMA_NUM_PARALLEL); others queue.")
+parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of generations answered with HTTP 500.")
+parser.add_argument("--seed", type=int, default=0)
+
+app = FastAPI(title="Fake Ollama")
+settings: argparse.Namespace = parser.parse_args([]) # Replaced in __main__
+_rng = random.Random(0)
+_slots: asyncio.Semaphore | None = None
+_loaded: dict[str, float] = {} # model -> expiry timestamp
+
+
+def _jittered(seconds: float) -> float:
+    if settings.jitter <= 0:
+        return seconds
+    return max(0.0, seconds * (1 + _rng.uniform(-settings.jitter, settings.jitter)))
+
+
+def _models() -> list[str]:
+    return [name.strip() for name in settings.models.split(",") if name.strip()]
+
+
+def _keep_alive_seconds(value) -> float:
+    """Parses Ollama keep_alive values ("5m", "30s", "1h", seconds, negative = forever)."""
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    value = str(value).strip()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value and value[-1] in units:
+        number = float(value[:-1])
+        return float("inf") if number < 0 else number * units[value[-1]]
+    number = float(value)
+    return float("inf") if number < 0 else number
+
+
+async def _generate(body: dict, text_key: str):
+    """Simulates one generation; yields (chunk_dict) like Ollama's NDJSON stream."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.parallel)
+    model = body.get("model")
+    started = time.perf_counter_ns()
+    keep_alive = _keep_alive_seconds(body.get("keep_alive"))
+    images = len(body.get("images") or []) + sum(len(m.get("images") or []) for m in body.get("messages") or [])
+    prompt_text = body.get("prompt") or "".join(m.get("content", "") for m in body.get("messages") or [])
+    if keep_alive == 0 and not prompt_text and not images:
+        # Empty prompt with keep_alive 0 is Ollama's "unload this model" request
+        _loaded.pop(model, None)
+        yield {"model": model, text_key: "", "done": True, "done_reason": "unload"}
+        return
+
+    async with _slots:
+        load_ns = 0
+        if _loaded.get(model, 0) < time.time():
+            load_seconds = _jittered(settings.load_ms / 1000)
+            await asyncio.sleep(load_seconds)
+            load_ns = int(load_seconds * 1e9)
+        _loaded[model] = time.time() + keep_alive
+        if keep_alive == 0:
+            _loaded.pop(model, None) # Unloaded right after this request
+
+        if not prompt_text and not images:
+            # Empty prompt: Ollama just loads the model and returns
+            yield {"model": model, text_key: "", "done": True, "done_reason": "load", "load_duration": load_ns}
+            return
+
+        prefill_seconds = _jittered((settings.prefill_ms + images * settings.prefill_ms_per_image) / 1000)
+        await asyncio.sleep(prefill_seconds)
+
+        token_interval = 1.0 / settings.tokens_per_second if settings.tokens_per_second > 0 else 0.0
+        eval_started = time.perf_counter_ns()
+        for i in range(settings.tokens):
+            await asyncio.sleep(_jittered(token_interval))
+            yield {"model": model, text_key: WORDS[i % len(WORDS)] + " ", "done": False}
+        eval_ns = time.perf_counter_ns() - eval_started
+
+        yield {
+            "model": model, text_key: "", "done": True, "done_reason": "stop",
+            "total_duration": time.perf_counter_ns() - started,
+            "load_duration": load_ns,
+            "prompt_eval_count": max(1, len(prompt_text) // 4) + images * 300,
+            "prompt_eval_duration": int(prefill_seconds * 1e9),
+            "eval_count": settings.tokens,
+            "eval_duration": eval_ns,
+        }
+
+
+async def _respond(request: Request, text_key: str):
+    body = await request.json()
+    if body.get("model") not in _models():
+        return JSONResponse({"error": f"model '{body.get('model')}' not found"}, status_code=404)
+    if settings.error_rate and _rng.random() < settings.error_rate:
+        return JSONResponse({"error": "simulated failure"}, status_code=500)
+
+    def wrap(chunk: dict) -> dict:
+        if text_key == "message":
+            chunk["message"] = {"role": "assistant", "content": chunk.pop("message")}
+        return chunk
+
+    if body.get("stream", True):
+        async def ndjson():
+            async for chunk in _generate(body, text_key):
+                yield json.dumps(wrap(chunk)) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    text = []
+    final = {}
+    async for chunk in _generate(body, text_key):
+        text.append(chunk[text_key])
+        final = chunk
+    final[text_key] = "".join(text)
+    return wrap(final)
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [
+        {"name": name, "model": name, "size": 4_000_000_000, "digest": f"bench{i}",
+         "details": {"family": "gemma3", "families": ["gemma3"] + (["clip"] if "vision" in name else []), "parameter_size": "4B", "quantization_level": "Q4_K_M"}}
+        for i, name in enumerate(_models())
+    ]}
+
+
+@app.get("/api/ps")
+async def ps():
+    now = time.time()
+    return {"models": [{"name": name, "model": name, "size": 4_000_000_000, "size_vram": 4_000_000_000,
+                        "expires_at": datetime.fromtimestamp(min(expiry, now + 10 * 365 * 86400), timezone.utc).isoformat()}
+                       for name, expiry in _loaded.items() if expiry > now]}
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    return await _respond(request, "response")
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    return await _respond(request, "message")
+
+
+if __name__ == "__main__":
+    settings = parser.parse_args()
+    _rng.seed(settings.seed)
+    print(f"Fake Ollama on http://{settings.host}:{settings.port} - models: {', '.join(_models())}, "
+          f"prefill {settings.prefill_ms:.0f} ms, {settings.tokens} tokens @ {settings.tokens_per_second:.0f} tok/s, parallel {settings.parallel}")
+    uvicorn.run(app, host=settings.host, port=settings.port, log_level="warning")
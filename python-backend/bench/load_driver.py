@@ -0,0 +1,260 @@
+# python-backend/bench/load_driver.py
+"""
+Closed-loop load driver for the AIFred backend.
+
+Runs each scenario at each concurrency level (N workers issuing requests
+back-to-back) and prints machine-readable JSON with throughput, latency
+percentiles, error counts, time-to-first-token for streams, and the mean of
+every stage the server reported in its Server-Timing header.
+
+    python bench/load_driver.py --scenarios ask,models,transcribe --concurrency 1,4,16 --requests 100 --out results.json
+
+Scenarios:
+    ask         POST /api/ask
+    ask_stream  POST /api/ask/stream (also measures time to first token)
+    models      GET  /api/models
+    transcribe  POST /api/transcribe with a synthetic clip (see synth_audio.py)
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+from synth_audio import make_clip
+
+SCENARIOS = ("ask", "ask_stream", "models", "transcribe")
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values: list[float]) -> dict | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "mean": round(sum(values) / len(values), 2),
+        "min": round(values[0], 2),
+        "max": round(values[-1], 2),
+    }
+
+
+def parse_server_timing(header: str | None) -> dict[str, float]:
+    """'asr_decode;dur=12.3, total;dur=40.1' -> {"asr_decode": 12.3, "total": 40.1} (milliseconds)."""
+    stages = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                try:
+                    stages[name] = float(value)
+                except ValueError:
+                    pass
+    return stages
+
+
+class Sample:
+    __slots__ = ("ok", "status", "latency_ms", "ttft_ms", "server_timing", "error")
+
+    def __init__(self, ok: bool, status: int | None, latency_ms: float, ttft_ms: float | None = None,
+                 server_timing: dict | None = None, error: str | None = None):
+        self.ok = ok
+        self.status = status
+        self.latency_ms = latency_ms
+        self.ttft_ms = ttft_ms
+        self.server_timing = server_timing or {}
+        self.error = error
+
+
+class LoadDriver:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.base_url = args.base_url.rstrip("/")
+        self._prompt_ids = itertools.count()
+        self._clip: bytes | None = None
+        if "transcribe" in args.scenarios:
+            self._clip = make_clip(args.audio_seconds, args.audio_format, seed=args.seed)
+
+    def _ask_payload(self) -> dict:
+        prompt = self.args.prompt
+        if self.args.unique_prompts:
+            prompt = f"{prompt} (#{next(self._prompt_ids)})"
+        payload = {"prompt": prompt, "bypass_cache": self.args.unique_prompts}
+        if self.args.model:
+            payload["model"] = self.args.model
+        return payload
+
+    async def _one(self, client: httpx.AsyncClient, scenario: str) -> Sample:
+        started = time.perf_counter()
+
+        def elapsed_ms() -> float:
+            return (time.perf_counter() - started) * 1000
+
+        try:
+            if scenario == "ask":
+                response = await client.post(f"{self.base_url}/api/ask", json=self._ask_payload())
+            elif scenario == "models":
+                response = await client.get(f"{self.base_url}/api/models")
+            elif scenario == "transcribe":
+                files = {"audio_file": (f"clip.{self.args.audio_format}", self._clip, f"audio/{self.args.audio_format}")}
+                response = await client.post(f"{self.base_url}/api/transcribe", files=files)
+            elif scenario == "ask_stream":
+                return await self._one_stream(client, started)
+            else:
+                raise ValueError(f"Unknown scenario '{scenario}'")
+        except httpx.HTTPError as e:
+            return Sample(False, None, elapsed_ms(), error=f"{type(e).__name__}: {e}")
+        return Sample(response.is_success, response.status_code, elapsed_ms(),
+                      server_timing=parse_server_timing(response.headers.get("server-timing")),
+                      error=None if response.is_success else response.text[:200])
+
+    async def _one_stream(self, client: httpx.AsyncClient, started: float) -> Sample:
+        ttft_ms = None
+        error = None
+        try:
+            async with client.stream("POST", f"{self.base_url}/api/ask/stream", json=self._ask_payload()) as response:
+                server_timing = parse_server_timing(response.headers.get("server-timing"))
+                if not response.is_success:
+                    body = await response.aread()
+                    return Sample(False, response.status_code, (time.perf_counter() - started) * 1000,
+                                  server_timing=server_timing, error=body.decode(errors="replace")[:200])
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:") and event == "token" and ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    elif line.startswith("data:") and event == "error":
+                        error = line[5:].strip()[:200]
+        except httpx.HTTPError as e:
+            return Sample(False, None, (time.perf_counter() - started) * 1000, error=f"{type(e).__name__}: {e}")
+        return Sample(error is None, response.status_code, (time.perf_counter() - started) * 1000, ttft_ms, server_timing, error)
+
+    async def run_level(self, scenario: str, concurrency: int) -> dict:
+        samples: list[Sample] = []
+        remaining = itertools.count()
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(timeout=self.args.timeout, limits=limits) as client:
+            for _ in range(self.args.warmup):
+                await self._one(client, scenario)
+
+            deadline = time.perf_counter() + self.args.duration if self.args.duration else None
+
+            async def worker():
+                while True:
+                    if deadline is not None:
+                        if time.perf_counter() >= deadline:
+                            return
+                    elif next(remaining) >= self.args.requests:
+                        return
+                    samples.append(await self._one(client, scenario))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            wall_seconds = time.perf_counter() - started
+
+        ok = [s for s in samples if s.ok]
+        status_codes: dict[str, int] = {}
+        for s in samples:
+            key = str(s.status) if s.status is not None else "transport_error"
+            status_codes[key] = status_codes.get(key, 0) + 1
+        stage_totals: dict[str, list[float]] = {}
+        for s in ok:
+            for stage, ms in s.server_timing.items():
+                stage_totals.setdefault(stage, []).append(ms)
+        errors = [s.error for s in samples if not s.ok and s.error]
+        return {
+            "scenario": scenario,
+            "concurrency": concurrency,
+            "requests": len(samples),
+            "ok": len(ok),
+            "errors": len(samples) - len(ok),
+            "status_codes": status_codes,
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_rps": round(len(ok) / wall_seconds, 3) if wall_seconds > 0 else None,
+            "latency_ms": summarize([s.latency_ms for s in ok]),
+            "ttft_ms": summarize([s.ttft_ms for s in ok if s.ttft_ms is not None]),
+            "server_timing_mean_ms": {stage: round(sum(v) / len(v), 2) for stage, v in sorted(stage_totals.items())},
+            "sample_errors": sorted(set(errors))[:5],
+        }
+
+    async def run(self) -> dict:
+        results = []
+        for scenario in self.args.scenarios:
+            for concurrency in self.args.concurrency:
+                result = await self.run_level(scenario, concurrency)
+                latency = result["latency_ms"] or {}
+                print(f"{scenario:>11} c={concurrency:<3} {result['ok']}/{result['requests']} ok  "
+                      f"{result['throughput_rps']} req/s  p50={latency.get('p50')} p95={latency.get('p95')} p99={latency.get('p99')} ms",
+                      file=sys.stderr)
+                results.append(result)
+        return {
+            "base_url": self.base_url,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+            "settings": {key: value for key, value in vars(self.args).items() if key != "out"},
+            "results": results,
+        }
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the AIFred backend at fixed concurrency levels and report latency percentiles.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", default="ask,models", help=f"Comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="Comma-separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per scenario and concurrency level.")
+    parser.add_argument("--duration", type=float, default=0.0, help="Run each level for this many seconds instead of a fixed request count.")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests before each level.")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--model", default=None, help="Model for ask scenarios (default: the backend's configured model).")
+    parser.add_argument("--prompt", default="Summarize the benefits of unit tests in two sentences.")
+    parser.add_argument("--no-unique-prompts", dest="unique_prompts", action="store_false",
+                        help="Send the identical prompt every time (measures response cache hits).")
+    parser.add_argument("--audio-seconds", type=float, default=5.0)
+    parser.add_argument("--audio-format", choices=("wav", "webm"), default="webm")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(LoadDriver(args).run())
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+        print(f"Report written to {args.out}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
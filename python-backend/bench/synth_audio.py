@@ -0,0 +1,102 @@
+# python-backend/bench/synth_audio.py
+"""
+Deterministic synthetic audio clips for /api/transcribe benchmarks.
+
+Produces speech-like audio (voiced harmonic "syllables" with pitch glides,
+separated by short pauses and longer gaps between "words") of an exact length,
+so decode, VAD and inference costs scale like real recordings. The content is
+not intelligible; use real recordings to measure accuracy.
+
+    python bench/synth_audio.py --seconds 5 --format webm --out clip.webm
+"""
+
+import argparse
+import io
+import subprocess
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def synth_speech_like(seconds: float, sample_rate: int = SAMPLE_RATE, seed: int = 0,
+                      leading_silence: float = 0.0, trailing_silence: float = 0.0) -> np.ndarray:
+    """Returns float32 mono samples in [-1, 1] of exactly `seconds` (+ optional silence padding)."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    audio = np.zeros(total, dtype=np.float32)
+    position = 0
+    while position < total:
+        # One "word": 1-4 syllables of 120-300 ms, then a 60-400 ms pause
+        for _ in range(rng.integers(1, 5)):
+            length = int(rng.uniform(0.12, 0.3) * sample_rate)
+            end = min(position + length, total)
+            n = end - position
+            if n <= 0:
+                break
+            t = np.arange(n) / sample_rate
+            pitch = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(1, 4) * t))
+            phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+            voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+            envelope = np.sin(np.pi * np.arange(n) / n) ** 2
+            audio[position:end] = 0.25 * envelope * voiced + 0.01 * rng.standard_normal(n)
+            position = end + int(rng.uniform(0.02, 0.06) * sample_rate)
+        position += int(rng.uniform(0.06, 0.4) * sample_rate)
+
+    audio += 0.002 * rng.standard_normal(total).astype(np.float32) # Background noise floor
+    lead = np.zeros(int(leading_silence * sample_rate), dtype=np.float32)
+    trail = np.zeros(int(trailing_silence * sample_rate), dtype=np.float32)
+    return np.clip(np.concatenate([lead, audio, trail]), -1.0, 1.0).astype(np.float32)
+
+
+def to_wav_bytes(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Encodes float32 samples as 16-bit PCM mono WAV."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((samples * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def to_webm_bytes(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, ffmpeg: str = "ffmpeg") -> bytes:
+    """Encodes float32 samples as WebM/Opus (what the Electron MediaRecorder sends) using ffmpeg."""
+    command = [
+        ffmpeg, "-hide_banner", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+        "-c:a", "libopus", "-b:a", "32k", "-f", "webm", "pipe:1",
+    ]
+    result = subprocess.run(command, input=samples.astype("<f4").tobytes(), capture_output=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to encode WebM: {result.stderr.decode(errors='replace')[-300:]}")
+    return result.stdout
+
+
+def make_clip(seconds: float, fmt: str = "wav", seed: int = 0, **kwargs) -> bytes:
+    """Returns an encoded clip ("wav", "webm" or raw "pcm_s16le") of the given length."""
+    samples = synth_speech_like(seconds, seed=seed, **kwargs)
+    if fmt == "wav":
+        return to_wav_bytes(samples)
+    if fmt == "webm":
+        return to_webm_bytes(samples)
+    if fmt == "pcm_s16le":
+        return (samples * 32767).astype("<i2").tobytes()
+    raise ValueError(f"Unsupported format '{fmt}'. Expected wav, webm or pcm_s16le.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic speech-like audio clip.")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--format", choices=("wav", "webm", "pcm_s16le"), default="wav")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--leading-silence", type=float, default=0.0)
+    parser.add_argument("--trailing-silence", type=float, default=0.0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    data = make_clip(args.seconds, args.format, args.seed,
+                     leading_silence=args.leading_silence, trailing_silence=args.trailing_silence)
+    with open(args.out, "wb") as f:
+        f.write(data)
+    print(f"Wrote {args.out}: {args.seconds:.1f}s {args.format}, {len(data) // 1024} KB")
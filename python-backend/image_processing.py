@@ -0,0 +1,110 @@
+# python-backend/image_processing.py
+
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError: # Pillow is in requirements.txt, but keep the backend usable without it
+    Image = None
+    ImageOps = None
+    logger.warning("Pillow not installed; images will be forwarded to Ollama without downscaling.")
+
+
+class ImageProcessor:
+    """
+    Downscales and re-encodes images before they are sent to a vision model, and
+    remembers the result by content hash so repeated screenshots skip the work.
+
+    Images whose longest side is already within `max_dimension` and whose encoded
+    size is under `passthrough_bytes` are forwarded unchanged to avoid needless
+    recompression.
+
+    Args:
+        max_dimension: Longest side (pixels) after downscaling.
+        jpeg_quality: JPEG quality used when re-encoding (1-95).
+        cache_entries: Number of processed images kept in the content-hash cache.
+        passthrough_bytes: Small images below this size are not re-encoded.
+    """
+
+    def __init__(self, max_dimension: int = 1344, jpeg_quality: int = 85, cache_entries: int = 64, passthrough_bytes: int = 512 * 1024):
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.cache_entries = max(1, cache_entries)
+        self.passthrough_bytes = passthrough_bytes
+        self._cache: OrderedDict[str, str] = OrderedDict() # sha256 of original bytes -> processed base64
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def process(self, image_bytes: bytes) -> str:
+        """
+        Returns the processed image as a base64 string ready for Ollama's "images" field.
+
+        Raises:
+            ValueError: If the bytes are not a readable image.
+        """
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        with self._lock:
+            cached = self._cache.get(digest)
+            if cached is not None:
+                self._cache.move_to_end(digest)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        processed = base64.b64encode(self._downscale(image_bytes)).decode("ascii")
+        with self._lock:
+            self._cache[digest] = processed
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return processed
+
+    def process_base64(self, image_b64: str) -> str:
+        """Same as process(), for images that arrive base64 encoded in a JSON body."""
+        try:
+            image_bytes = base64.b64decode(image_b64, validate=False)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"Invalid base64 image data: {e}") from e
+        return self.process(image_bytes)
+
+    def _downscale(self, image_bytes: bytes) -> bytes:
+        if Image is None:
+            return image_bytes
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+            image.load()
+        except Exception as e:
+            raise ValueError(f"Unreadable image data: {e}") from e
+
+        original_size = image.size
+        if max(original_size) <= self.max_dimension and len(image_bytes) <= self.passthrough_bytes:
+            return image_bytes
+
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha channel; flatten transparent areas onto white
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        processed = output.getvalue()
+        logger.info(f"Image downscaled {original_size[0]}x{original_size[1]} -> {image.size[0]}x{image.size[1]}, {len(image_bytes) // 1024} KB -> {len(processed) // 1024} KB")
+        return processed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -2,9 +2,67 @@
 import httpx
 import json
 import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Shared HTTP Client ---
+# One pooled AsyncClient for the lifetime of the app, created/closed by the
+# FastAPI startup/shutdown hooks in server.py. Reusing it keeps TCP connections
+# to Ollama alive between requests instead of reconnecting every time.
+_http_client: httpx.AsyncClient | None = None
+
+def init_http_client(
+    max_connections: int = 20,
+    max_keepalive_connections: int = 10,
+    keepalive_expiry: float = 30.0,
+    connect_timeout: float = 60.0,
+    read_timeout: float = 300.0,
+) -> httpx.AsyncClient:
+    """Creates the shared Ollama HTTP client (no-op if it already exists)."""
+    global _http_client
+    if _http_client is None:
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        _http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        logger.info(f"Shared Ollama HTTP client created (max_connections={max_connections}, keepalive={max_keepalive_connections}, expiry={keepalive_expiry}s).")
+    return _http_client
+
+async def close_http_client():
+    """Closes the shared Ollama HTTP client and its pooled connections."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("Shared Ollama HTTP client closed.")
+
+def get_http_client() -> httpx.AsyncClient | None:
+    """Returns the shared Ollama HTTP client, or None if it has not been initialised."""
+    return _http_client
+
+@asynccontextmanager
+async def ollama_http_client():
+    """
+    Yields the shared client when available. Falls back to a short-lived client
+    so the functions below keep working when used outside the FastAPI app.
+    """
+    if _http_client is not None:
+        yield _http_client
+    else:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(300.0, connect=60.0)) as client:
+            yield client
+# --- End Shared HTTP Client ---
 
 # Renamed function and added optional image parameter
-async def get_ollama_suggestion(endpoint: str, model: str, prompt: str, base64_image: str | None = None) -> tuple[str | None, str | None]:
+async def get_ollama_suggestion(endpoint: str, model: str, prompt: str, base64_image: str | None = None, options: dict | None = None) -> tuple[str | None, str | None]:
     """
     Sends a prompt (and optionally a base64 image) to the Ollama API.
 
@@ -13,6 +71,7 @@ async def get_ollama_suggestion(endpoint: str, model: str, prompt: str, base64_i
         model: The name of the Ollama model to use.
         prompt: The text prompt.
         base64_image: Optional base64 encoded string of the image.
+        options: Optional Ollama generation options (temperature, num_ctx, ...).
 
     Returns:
         A tuple containing (suggestion_text, error_message).
@@ -23,40 +82,262 @@ async def get_ollama_suggestion(endpoint: str, model: str, prompt: str, base64_i
         "prompt": prompt,
         "stream": False
     }
-    # --- Add image only if provided ---
+    # --- Add image and options only if provided ---
     if base64_image:
         payload["images"] = [base64_image]
+    if options:
+        payload["options"] = options
     # ---
 
     headers = {'Content-Type': 'application/json'}
 
-    print(f"Sending request to {api_url} with model {model}...")
+    logger.info(f"Sending request to {api_url} with model {model}...")
     # Log payload type (text or image)
     log_payload = payload.copy()
     if "images" in log_payload: log_payload["images"] = ["[omitted]"]
-    print(f"Payload: {log_payload}")
+    logger.debug(f"Payload: {log_payload}")
 
 
     try:
-        timeout = httpx.Timeout(300.0, connect=60.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
+        async with ollama_http_client() as client:
             response = await client.post(api_url, headers=headers, json=payload)
             response.raise_for_status()
             response_data = response.json()
 
             if response_data and 'response' in response_data:
-                print("Ollama suggestion received.")
+                logger.info("Ollama suggestion received.")
+                metrics.observe_ollama_stats(model, endpoint, response_data)
                 return response_data['response'].strip(), None
             else:
-                print(f"Ollama response missing 'response' key: {response_data}")
+                logger.error(f"Ollama response missing 'response' key: {response_data}")
                 return None, f"Unexpected response format from Ollama: {response_data}"
     # ... (error handling remains the same) ...
     except httpx.HTTPStatusError as e:
         error_detail = f"HTTP Error: {e.response.status_code} - {e.response.text}"
-        print(error_detail); return None, error_detail
+        logger.error(error_detail); return None, error_detail
+    except httpx.TimeoutException as e:
+        error_detail = f"Timeout Error: {type(e).__name__} {e}"; logger.error(error_detail); return None, error_detail
     except httpx.RequestError as e:
-        error_detail = f"Connection Error: {e}"; print(error_detail); return None, error_detail
+        error_detail = f"Connection Error: {e}"; logger.error(error_detail); return None, error_detail
     except json.JSONDecodeError as e:
-        error_detail = f"JSON Decode Error: {e}. Response: {response.text[:100]}..."; print(error_detail); return None, error_detail
+        error_detail = f"JSON Decode Error: {e}. Response: {response.text[:100]}..."; logger.error(error_detail); return None, error_detail
     except Exception as e:
-        import traceback; error_detail = f"Unexpected error: {e}\n{traceback.format_exc()}"; print(error_detail); return None, error_detail
\ No newline at end of file
+        error_detail = f"Unexpected error: {e}"; logger.error(error_detail, exc_info=True); return None, error_detail
+
+async def prewarm_model(endpoint: str, model: str, keep_alive: str | int | None = None) -> tuple[float | None, str | None]:
+    """
+    Asks Ollama to load `model` into memory without generating anything (a
+    request with an empty prompt), so a generation that follows soon after
+    doesn't pay the load time.
+
+    Returns:
+        A tuple containing (load_seconds, error_message).
+    """
+    api_url = f"{endpoint.rstrip('/')}/api/generate"
+    payload = {"model": model, "prompt": "", "stream": False}
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    logger.info(f"Prewarming model {model} on {endpoint}...")
+    try:
+        async with ollama_http_client() as client:
+            response = await client.post(api_url, json=payload)
+            response.raise_for_status()
+            load_seconds = response.json().get("load_duration", 0) / 1e9
+            metrics.record_stage("ollama_prewarm", load_seconds)
+            logger.info(f"Model {model} loaded on {endpoint} (load took {load_seconds:.2f}s).")
+            return load_seconds, None
+    except httpx.HTTPStatusError as e:
+        error_detail = f"HTTP Error: {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail); return None, error_detail
+    except httpx.TimeoutException as e:
+        error_detail = f"Timeout Error: {type(e).__name__} {e}"; logger.error(error_detail); return None, error_detail
+    except httpx.RequestError as e:
+        error_detail = f"Connection Error: {e}"; logger.error(error_detail); return None, error_detail
+    except json.JSONDecodeError as e:
+        error_detail = f"JSON Decode Error: {e}"; logger.error(error_detail); return None, error_detail
+    except Exception as e:
+        error_detail = f"Unexpected error: {e}"; logger.error(error_detail, exc_info=True); return None, error_detail
+
+async def unload_model(endpoint: str, model: str) -> tuple[bool, str | None]:
+    """
+    Asks Ollama to unload `model` from memory now (an empty prompt with keep_alive 0).
+
+    Returns:
+        A tuple containing (unloaded, error_message).
+    """
+    api_url = f"{endpoint.rstrip('/')}/api/generate"
+    try:
+        async with ollama_http_client() as client:
+            response = await client.post(api_url, json={"model": model, "prompt": "", "stream": False, "keep_alive": 0})
+            response.raise_for_status()
+            logger.info(f"Model {model} unloaded from {endpoint}.")
+            return True, None
+    except httpx.HTTPStatusError as e:
+        error_detail = f"HTTP Error: {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail); return False, error_detail
+    except httpx.TimeoutException as e:
+        error_detail = f"Timeout Error: {type(e).__name__} {e}"; logger.error(error_detail); return False, error_detail
+    except httpx.RequestError as e:
+        error_detail = f"Connection Error: {e}"; logger.error(error_detail); return False, error_detail
+    except Exception as e:
+        error_detail = f"Unexpected error: {e}"; logger.error(error_detail, exc_info=True); return False, error_detail
+
+# Keys from Ollama's final (done) chunk that are forwarded to streaming clients
+OLLAMA_STATS_KEYS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+async def stream_ollama_suggestion(endpoint: str, model: str, prompt: str, base64_image: str | None = None, options: dict | None = None):
+    """
+    Streams a suggestion from the Ollama API token by token.
+
+    Consumes Ollama's NDJSON stream incrementally instead of waiting for the
+    whole generation, so callers can forward tokens as soon as they arrive.
+
+    Args:
+        endpoint: The base URL of the Ollama API.
+        model: The name of the Ollama model to use.
+        prompt: The text prompt.
+        base64_image: Optional base64 encoded string of the image.
+        options: Optional Ollama generation options (temperature, num_ctx, ...).
+
+    Yields:
+        (event, data) tuples, where event is one of:
+            "token": data is the text fragment produced by the model.
+            "done":  data is a dict of Ollama's timing stats (durations in ns).
+            "error": data is an error message; no further events follow.
+    """
+    api_url = f"{endpoint.rstrip('/')}/api/generate"
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True
+    }
+    if base64_image:
+        payload["images"] = [base64_image]
+    if options:
+        payload["options"] = options
+
+    async for event in _stream_ndjson(api_url, payload, lambda chunk: chunk.get("response")):
+        yield event
+
+
+async def _stream_ndjson(api_url: str, payload: dict, text_of):
+    """
+    Posts `payload` to a streaming Ollama endpoint and yields ("token" | "done" | "error", data)
+    events. `text_of` extracts the generated text from one NDJSON chunk.
+    """
+    headers = {'Content-Type': 'application/json'}
+    logger.info(f"Streaming request to {api_url} with model {payload.get('model')}...")
+    started = time.perf_counter()
+    time_to_first_token = None
+
+    try:
+        async with ollama_http_client() as client:
+            async with client.stream("POST", api_url, headers=headers, json=payload) as response:
+                if response.is_error:
+                    body = await response.aread()
+                    error_detail = f"HTTP Error: {response.status_code} - {body.decode(errors='replace')}"
+                    logger.error(error_detail)
+                    yield "error", error_detail
+                    return
+
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        yield "error", f"Ollama error: {chunk['error']}"
+                        return
+                    text = text_of(chunk)
+                    if text:
+                        if time_to_first_token is None:
+                            time_to_first_token = time.perf_counter() - started
+                        yield "token", text
+                    if chunk.get("done"):
+                        stats = {key: chunk[key] for key in OLLAMA_STATS_KEYS if key in chunk}
+                        logger.info("Ollama stream finished.")
+                        metrics.observe_ollama_stats(payload.get("model"), api_url.rsplit("/api/", 1)[0], stats, time_to_first_token)
+                        yield "done", stats
+                        return
+
+                # Stream closed without a final "done" chunk
+                yield "error", "Ollama stream ended unexpectedly."
+    except httpx.TimeoutException as e:
+        error_detail = f"Timeout Error: {type(e).__name__} {e}"; logger.error(error_detail); yield "error", error_detail
+    except httpx.RequestError as e:
+        error_detail = f"Connection Error: {e}"; logger.error(error_detail); yield "error", error_detail
+    except json.JSONDecodeError as e:
+        error_detail = f"JSON Decode Error in stream: {e}"; logger.error(error_detail); yield "error", error_detail
+    except Exception as e:
+        error_detail = f"Unexpected error: {e}"; logger.error(error_detail, exc_info=True); yield "error", error_detail
+
+
+# --- Chat (multi-turn) API ---
+def _chat_payload(model: str, messages: list[dict], stream: bool, options: dict | None, keep_alive: str | int | None) -> dict:
+    payload = {"model": model, "messages": messages, "stream": stream}
+    if options:
+        payload["options"] = options
+    if keep_alive is not None:
+        # Keeping the model resident lets Ollama reuse the KV cache for the unchanged
+        # history prefix, so a follow-up only prefills the new message.
+        payload["keep_alive"] = keep_alive
+    return payload
+
+async def get_ollama_chat_reply(endpoint: str, model: str, messages: list[dict], options: dict | None = None, keep_alive: str | int | None = None) -> tuple[str | None, str | None]:
+    """
+    Sends a conversation to Ollama's /api/chat endpoint.
+
+    Args:
+        endpoint: The base URL of the Ollama API.
+        model: The name of the Ollama model to use.
+        messages: Chat history in Ollama format ({"role", "content", optional "images"}).
+        options: Optional Ollama generation options.
+        keep_alive: How long Ollama keeps the model loaded afterwards (e.g. "30m").
+
+    Returns:
+        A tuple containing (reply_text, error_message).
+    """
+    api_url = f"{endpoint.rstrip('/')}/api/chat"
+    payload = _chat_payload(model, messages, False, options, keep_alive)
+    logger.info(f"Sending chat request to {api_url} with model {model} ({len(messages)} messages)...")
+
+    try:
+        async with ollama_http_client() as client:
+            response = await client.post(api_url, json=payload)
+            response.raise_for_status()
+            response_data = response.json()
+            message = response_data.get("message") if isinstance(response_data, dict) else None
+            if message and "content" in message:
+                logger.info("Ollama chat reply received.")
+                metrics.observe_ollama_stats(model, endpoint, response_data)
+                return message["content"].strip(), None
+            logger.error(f"Ollama chat response missing 'message' key: {response_data}")
+            return None, f"Unexpected response format from Ollama: {response_data}"
+    except httpx.HTTPStatusError as e:
+        error_detail = f"HTTP Error: {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail); return None, error_detail
+    except httpx.TimeoutException as e:
+        error_detail = f"Timeout Error: {type(e).__name__} {e}"; logger.error(error_detail); return None, error_detail
+    except httpx.RequestError as e:
+        error_detail = f"Connection Error: {e}"; logger.error(error_detail); return None, error_detail
+    except json.JSONDecodeError as e:
+        error_detail = f"JSON Decode Error: {e}"; logger.error(error_detail); return None, error_detail
+    except Exception as e:
+        error_detail = f"Unexpected error: {e}"; logger.error(error_detail, exc_info=True); return None, error_detail
+
+async def stream_ollama_chat(endpoint: str, model: str, messages: list[dict], options: dict | None = None, keep_alive: str | int | None = None):
+    """
+    Streaming variant of get_ollama_chat_reply. Yields the same (event, data)
+    tuples as stream_ollama_suggestion.
+    """
+    api_url = f"{endpoint.rstrip('/')}/api/chat"
+    payload = _chat_payload(model, messages, True, options, keep_alive)
+    async for event in _stream_ndjson(api_url, payload, lambda chunk: (chunk.get("message") or {}).get("content")):
+        yield event
+# --- End Chat (multi-turn) API ---
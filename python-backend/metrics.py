@@ -0,0 +1,207 @@
+# python-backend/metrics.py
+"""
+Latency instrumentation for the backend.
+
+Keeps a handful of Prometheus histograms in process (rendered in the text
+exposition format by /metrics, no client library needed) and collects the
+stages of the current request so server.py can report them in a
+`Server-Timing` response header.
+
+Each uvicorn worker process has its own registry; scrape every worker, or run
+a single worker, when AIFRED_WORKERS > 1.
+"""
+
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Default latency buckets in seconds (covers fast cache hits up to long generations)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_RATE_BUCKETS = (1, 2.5, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == math.inf else f"{value:g}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, safe to observe from worker threads."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: dict[tuple, list] = {} # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            labels = dict(zip(self.label_names, key))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+_registry: list[Histogram] = []
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "aifred_http_request_duration_seconds",
+    "Time until the response headers were ready, by route.",
+    ("method", "route", "status"))
+STAGE_SECONDS = Histogram(
+    "aifred_stage_duration_seconds",
+    "Duration of individual processing stages (ASR decode/queue/inference, Ollama load/prefill/generation, ...).",
+    ("stage",))
+ASR_AUDIO_SECONDS = Histogram(
+    "aifred_asr_audio_seconds",
+    "Audio duration per transcription: received (input), dropped by VAD (removed) and sent to the model (transcribed).",
+    ("kind",))
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "aifred_llm_time_to_first_token_seconds",
+    "Time from sending a request to Ollama until the first token (load + prompt eval when not streamed).",
+    ("model", "endpoint"))
+LLM_TOKENS_PER_SECOND = Histogram(
+    "aifred_llm_tokens_per_second",
+    "Generation speed reported by Ollama (eval_count / eval_duration).",
+    ("model",), buckets=TOKEN_RATE_BUCKETS)
+
+
+def render() -> str:
+    """Returns all metrics in the Prometheus text exposition format."""
+    lines = []
+    for histogram in _registry:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Per-request stage timings (Server-Timing) ---
+_request_stages: contextvars.ContextVar[list | None] = contextvars.ContextVar("aifred_request_stages", default=None)
+
+def begin_request() -> contextvars.Token:
+    """Starts collecting stage timings for the current request (tasks and threads it spawns share the list)."""
+    return _request_stages.set([])
+
+def end_request(token: contextvars.Token) -> list[tuple[str, float]]:
+    """Stops collecting and returns the (stage, seconds) pairs recorded for the request."""
+    stages = _request_stages.get() or []
+    _request_stages.reset(token)
+    return stages
+
+def record_stage(stage: str, seconds: float):
+    """Records a stage duration in the stage histogram and in the current request's Server-Timing."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((stage, seconds))
+
+@contextmanager
+def timed(stage: str):
+    """Times the enclosed block as `stage` (recorded even if it raises)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+def server_timing_header(stages: list[tuple[str, float]], total_seconds: float | None = None) -> str:
+    """Formats stages as a Server-Timing header value (durations in milliseconds); repeated stages are summed."""
+    merged: dict[str, float] = {}
+    for stage, seconds in stages:
+        merged[stage] = merged.get(stage, 0.0) + seconds
+    if total_seconds is not None:
+        merged["total"] = total_seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in merged.items())
+# --- End Per-request stage timings ---
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware that collects the stages recorded while a request is handled,
+    adds them to the response as a `Server-Timing` header and observes the
+    request duration per route. For streamed responses the header (and the
+    histogram) cover the time until the response starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = begin_request()
+        stages = _request_stages.get()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - started
+                route = scope.get("route")
+                HTTP_REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=getattr(route, "path", "unmatched"), status=status)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(stages, elapsed).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request(token)
+
+
+def observe_ollama_stats(model: str, endpoint: str, stats: dict, time_to_first_token: float | None = None):
+    """
+    Records Ollama's own timing stats (durations in ns) for one generation:
+    model load, prompt evaluation (prefill) and token generation, plus TTFT and
+    tokens/second. When `time_to_first_token` was not measured (non-streamed
+    calls), it is approximated as load_duration + prompt_eval_duration.
+    """
+    load = stats.get("load_duration", 0) / 1e9
+    prompt_eval = stats.get("prompt_eval_duration", 0) / 1e9
+    eval_seconds = stats.get("eval_duration", 0) / 1e9
+    if "load_duration" in stats:
+        record_stage("ollama_load", load)
+    if "prompt_eval_duration" in stats:
+        record_stage("ollama_prefill", prompt_eval)
+    if "eval_duration" in stats:
+        record_stage("ollama_generate", eval_seconds)
+    if time_to_first_token is None and ("load_duration" in stats or "prompt_eval_duration" in stats):
+        time_to_first_token = load + prompt_eval
+    if time_to_first_token is not None:
+        LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(time_to_first_token, model=model, endpoint=endpoint)
+    if stats.get("eval_count") and eval_seconds > 0:
+        LLM_TOKENS_PER_SECOND.observe(stats["eval_count"] / eval_seconds, model=model)
@@ -0,0 +1,170 @@
+# python-backend/model_catalog.py
+
+import asyncio
+import logging
+import time
+
+import httpx
+
+import llm_client
+
+logger = logging.getLogger(__name__)
+
+# Model families (from the tags payload "details.families") that indicate vision support.
+# Ollama lists a separate projector family (e.g. "clip") for most LLaVA-style models.
+MULTIMODAL_FAMILIES = {"clip", "mllama", "gemma3", "qwen25vl", "qwen2vl", "llava", "bakllava", "minicpmv", "moondream"}
+
+
+def _parse_model(entry: dict) -> dict:
+    """Flattens one entry of Ollama's /api/tags payload into the catalog format."""
+    details = entry.get("details") or {}
+    families = details.get("families") or ([details["family"]] if details.get("family") else [])
+    return {
+        "name": entry.get("name"),
+        "size": entry.get("size"),
+        "modified_at": entry.get("modified_at"),
+        "family": details.get("family"),
+        "families": families,
+        "parameter_size": details.get("parameter_size"),
+        "quantization_level": details.get("quantization_level"),
+        "multimodal": any(family in MULTIMODAL_FAMILIES for family in families),
+    }
+
+
+class ModelCatalog:
+    """
+    In-process cache of the models available across the configured Ollama
+    endpoints, refreshed by a background task so /api/models and /api/status
+    never wait on a slow Ollama.
+
+    Each refresh polls every endpoint's /api/tags (and /api/ps for the models
+    currently loaded) and doubles as the router's active health check.
+    The last successful listing is kept when a refresh fails; `reachable`,
+    `last_error` and `last_error_status` describe the most recent check.
+
+    Args:
+        router: OllamaRouter holding the endpoints to poll.
+        refresh_interval: Seconds between background refreshes.
+        request_timeout: Read timeout for each /api/tags call.
+    """
+
+    def __init__(self, router, refresh_interval: float = 30.0, request_timeout: float = 15.0):
+        self.router = router
+        self.refresh_interval = refresh_interval
+        self.request_timeout = request_timeout
+        self.models: list[dict] = []
+        self.updated_at: float | None = None      # Last successful refresh (epoch seconds)
+        self.last_checked_at: float | None = None # Last refresh attempt, successful or not
+        self.reachable: bool | None = None        # None until the first check completes
+        self.last_error: str | None = None
+        self.last_error_status: int | None = None # HTTP status to report when no listing is available
+        self._task: asyncio.Task | None = None
+        self._refresh_lock = asyncio.Lock()
+
+    async def _check_endpoint(self, endpoint) -> list[dict] | None:
+        """Polls one endpoint. Returns its parsed models, or None (with the failure recorded)."""
+        tags_url = f"{endpoint.url}/api/tags"
+        timeout = httpx.Timeout(self.request_timeout, connect=5.0)
+        try:
+            async with llm_client.ollama_http_client() as client:
+                response = await client.get(tags_url, timeout=timeout)
+                response.raise_for_status()
+                data = response.json()
+                if not isinstance(data.get("models"), list):
+                    self._record_failure(endpoint, f"Unexpected response format from Ollama /api/tags: {str(data)[:200]}", 502)
+                    return None
+                running = []
+                try:
+                    ps_response = await client.get(f"{endpoint.url}/api/ps", timeout=timeout)
+                    if ps_response.is_success:
+                        running = ps_response.json().get("models") or []
+                except (httpx.HTTPError, ValueError):
+                    pass # Older Ollama versions have no /api/ps; residency is then unknown
+            models = [_parse_model(m) for m in data["models"] if m.get("name")]
+            self.router.mark_checked(endpoint, {m["name"] for m in models}, running)
+            return models
+        except httpx.TimeoutException:
+            self._record_failure(endpoint, f"Timeout connecting to Ollama model list at {tags_url}", 504)
+        except httpx.HTTPStatusError as e:
+            self._record_failure(endpoint, f"Ollama API error ({e.response.status_code}): {str(e.response.text)[:200]}", e.response.status_code or 502)
+        except httpx.RequestError:
+            self._record_failure(endpoint, f"Cannot connect to Ollama at {endpoint.url}. Is it running?", 503)
+        except Exception as e:
+            logger.error(f"Unexpected error refreshing model catalog from {endpoint.url}: {e}", exc_info=True)
+            self._record_failure(endpoint, f"An unexpected error occurred while fetching models: {e}", 500)
+        return None
+
+    async def refresh(self) -> bool:
+        """Polls every endpoint once and updates the merged catalog. Returns True if any endpoint answered."""
+        async with self._refresh_lock:
+            self.last_checked_at = time.time()
+            results = await asyncio.gather(*(self._check_endpoint(ep) for ep in self.router.endpoints))
+            merged: dict[str, dict] = {}
+            for endpoint, models in zip(self.router.endpoints, results):
+                for model in models or []:
+                    entry = merged.setdefault(model["name"], dict(model, endpoints=[]))
+                    entry["endpoints"].append(endpoint.url)
+            if not any(models is not None for models in results):
+                self.reachable = False
+                return False
+            self.models = sorted(merged.values(), key=lambda m: m["name"])
+            self.updated_at = self.last_checked_at
+            self.reachable = True
+            if all(models is not None for models in results):
+                self.last_error = None
+                self.last_error_status = None
+            logger.debug(f"Model catalog refreshed: {len(self.models)} models from {sum(r is not None for r in results)} endpoint(s).")
+            return True
+
+    def _record_failure(self, endpoint, message: str, status: int):
+        if endpoint.last_error != message:
+            logger.warning(f"Model catalog refresh failed: {message}") # Log state changes only
+        self.router.mark_check_failed(endpoint, message)
+        self.last_error = message
+        self.last_error_status = status
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Starts the background refresh task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop(), name="model-catalog-refresh")
+            logger.info(f"Model catalog refresh started (every {self.refresh_interval:.0f}s).")
+
+    async def stop(self):
+        """Stops the background refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get(self, name: str) -> dict | None:
+        """Returns the catalog entry for a model name, if known."""
+        return next((m for m in self.models if m["name"] == name), None)
+
+    def health(self) -> dict:
+        """Ollama reachability as seen by the last check."""
+        return {
+            "reachable": self.reachable,
+            "last_checked_at": self.last_checked_at,
+            "error": self.last_error,
+            "endpoints": self.router.snapshot(),
+        }
+
+    def snapshot(self) -> dict:
+        """Catalog contents plus staleness information."""
+        return {
+            "models": [m["name"] for m in self.models],
+            "details": self.models,
+            "updated_at": self.updated_at,
+            "stale_seconds": round(time.time() - self.updated_at, 1) if self.updated_at else None,
+            "ollama_reachable": self.reachable,
+            "refresh_error": self.last_error, # Listing above may be stale if set
+            "error": None,
+        }
@@ -0,0 +1,219 @@
+# python-backend/model_residency.py
+
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+
+import llm_client
+from ollama_router import is_endpoint_failure
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+
+def _expires_in(entry: dict) -> float | None:
+    """Seconds until an /api/ps entry's keep_alive runs out (None if unknown)."""
+    value = entry.get("expires_at")
+    if not value:
+        return None
+    # Ollama reports nanosecond precision; datetime accepts at most microseconds
+    value = re.sub(r"(\.\d{6})\d+", r"\1", value.replace("Z", "+00:00"))
+    try:
+        return datetime.fromisoformat(value).timestamp() - time.time()
+    except ValueError:
+        return None
+
+
+class ModelResidencyManager:
+    """
+    Keeps the models users are about to need loaded in Ollama, so model load
+    time stays off the request path.
+
+    - prewarm(model) loads a model on the endpoint the router will send its next
+      generation to (an empty-prompt request), e.g. as soon as it is selected in
+      the UI. Concurrent prewarms of the same model share one load.
+    - The pinned (default) model is loaded at startup with `pin_keep_alive` and
+      re-pinned whenever its keep_alive runs low (any ordinary generation resets
+      Ollama's keep_alive to the request's value).
+    - With a `memory_budget_gb`, least recently used models that have been idle
+      for `min_idle_seconds` are unloaded (keep_alive 0) while the models resident
+      on an endpoint exceed the budget, and room is made before a prewarm. Models
+      with generations in flight and the pinned model are never evicted.
+
+    Residency comes from the endpoints' /api/ps data, refreshed by the model
+    catalog's background poll; recency comes from the router.
+
+    Args:
+        router: OllamaRouter holding the endpoints.
+        catalog: ModelCatalog, for model sizes of models not yet loaded (optional).
+        pinned_model: Model kept loaded (None = no pinning).
+        pin_keep_alive: keep_alive used for the pinned model (Ollama duration, -1 = forever).
+        memory_budget_gb: Memory models may use per endpoint (0 = no eviction).
+        min_idle_seconds: Models used more recently than this are not evicted.
+        check_interval: Seconds between re-pin / eviction passes.
+    """
+
+    def __init__(self, router, catalog=None, pinned_model: str | None = None, pin_keep_alive: str | int = "24h",
+                 memory_budget_gb: float = 0.0, min_idle_seconds: float = 120.0, check_interval: float = 30.0):
+        self.router = router
+        self.catalog = catalog
+        self.pinned_model = pinned_model
+        self.pin_keep_alive = pin_keep_alive
+        self.memory_budget = int(memory_budget_gb * GB)
+        self.min_idle_seconds = min_idle_seconds
+        self.check_interval = check_interval
+        self.prewarms = 0
+        self.evictions: list[dict] = [] # Most recent last, bounded
+        self._loads: dict[tuple[str, str], asyncio.Task] = {}
+        self._task: asyncio.Task | None = None
+
+    # --- Prewarming ---
+    async def prewarm(self, model: str, keep_alive: str | int | None = None) -> dict:
+        """
+        Loads `model` on the endpoint its next generation will be routed to.
+
+        Returns:
+            {"model", "endpoint", "already_resident", "load_seconds", "evicted", "error"}.
+        """
+        endpoint = self.router.pick(model)
+        result = {"model": model, "endpoint": endpoint.url if endpoint else None, "already_resident": False,
+                  "load_seconds": None, "evicted": [], "error": None}
+        if endpoint is None:
+            result["error"] = "No Ollama endpoint available."
+            return result
+        if keep_alive is None and model == self.pinned_model:
+            keep_alive = self.pin_keep_alive
+        if model in endpoint.resident and keep_alive is None:
+            result["already_resident"] = True
+            return result
+
+        key = (endpoint.url, model)
+        task = self._loads.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(endpoint, model, keep_alive), name=f"prewarm-{model}")
+            self._loads[key] = task
+            task.add_done_callback(lambda _: self._loads.pop(key, None))
+        # Shielded: a client that disconnects mid-load doesn't cancel a load others may be waiting on
+        load_seconds, evicted, error = await asyncio.shield(task)
+        result.update(load_seconds=load_seconds, evicted=evicted, error=error)
+        return result
+
+    async def _load(self, endpoint, model: str, keep_alive) -> tuple[float | None, list[str], str | None]:
+        evicted = []
+        if model not in endpoint.resident:
+            evicted = await self._make_room(endpoint, self._model_size(endpoint, model), protect={model})
+        load_seconds, error = await llm_client.prewarm_model(endpoint.url, model, keep_alive)
+        if error is None:
+            self.prewarms += 1
+            self.router.report_success(endpoint, model)
+        elif is_endpoint_failure(error):
+            self.router.report_failure(endpoint, error)
+        return load_seconds, evicted, error
+    # --- End Prewarming ---
+
+    # --- Eviction ---
+    def _model_size(self, endpoint, model: str) -> int:
+        """Memory a model uses (or will use) on an endpoint, from /api/ps or else the catalog."""
+        entry = next((m for m in endpoint.running if m.get("name") == model), None)
+        if entry and entry.get("size"):
+            return int(entry["size"])
+        catalog_entry = self.catalog.get(model) if self.catalog is not None else None
+        return int((catalog_entry or {}).get("size") or 0)
+
+    def _resident_bytes(self, endpoint) -> int:
+        return sum(self._model_size(endpoint, name) for name in endpoint.resident)
+
+    def _eviction_candidates(self, endpoint, protect: set[str]) -> list[str]:
+        """Idle, unpinned resident models, least recently used first."""
+        now = time.time()
+        candidates = [
+            name for name in endpoint.resident
+            if name not in protect and name != self.pinned_model
+            and not endpoint.active_models.get(name)
+            and now - endpoint.last_used.get(name, 0.0) >= self.min_idle_seconds
+        ]
+        return sorted(candidates, key=lambda name: endpoint.last_used.get(name, 0.0))
+
+    async def _make_room(self, endpoint, needed_bytes: int = 0, protect: set[str] | None = None) -> list[str]:
+        """Unloads idle models until resident models plus `needed_bytes` fit the budget. Returns the unloaded models."""
+        if not self.memory_budget:
+            return []
+        evicted = []
+        for name in self._eviction_candidates(endpoint, protect or set()):
+            if self._resident_bytes(endpoint) + needed_bytes <= self.memory_budget:
+                break
+            size = self._model_size(endpoint, name)
+            unloaded, error = await llm_client.unload_model(endpoint.url, name)
+            if not unloaded:
+                logger.warning(f"Could not evict {name} from {endpoint.url}: {error}")
+                continue
+            endpoint.running = [m for m in endpoint.running if m.get("name") != name]
+            evicted.append(name)
+            self.evictions = (self.evictions + [{"model": name, "endpoint": endpoint.url, "size": size, "at": time.time()}])[-20:]
+        if self._resident_bytes(endpoint) + needed_bytes > self.memory_budget:
+            logger.log(logging.INFO if needed_bytes else logging.DEBUG, # The periodic pass would repeat it every interval
+                       f"Models on {endpoint.url} still exceed the {self.memory_budget / GB:.1f} GB budget (nothing else idle to evict).")
+        return evicted
+    # --- End Eviction ---
+
+    # --- Background maintenance ---
+    async def _repin(self):
+        endpoint = self.router.pick(self.pinned_model)
+        if endpoint is None or endpoint.ejected:
+            return
+        entry = next((m for m in endpoint.running if m.get("name") == self.pinned_model), None)
+        expires_in = _expires_in(entry) if entry else None
+        if entry is not None and (expires_in is None or expires_in > max(600.0, 2 * self.check_interval)):
+            return # Resident with plenty of keep_alive left (or unknown, e.g. just served)
+        logger.info(f"Pinning default model {self.pinned_model} on {endpoint.url} (keep_alive {self.pin_keep_alive}).")
+        await self.prewarm(self.pinned_model, keep_alive=self.pin_keep_alive)
+
+    async def run_once(self):
+        """One maintenance pass: re-pin the pinned model, then enforce the memory budget on every endpoint."""
+        if self.pinned_model:
+            await self._repin()
+        for endpoint in self.router.endpoints:
+            if not endpoint.ejected:
+                await self._make_room(endpoint)
+
+    async def _maintenance_loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Model residency maintenance failed: {e}", exc_info=True)
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        """Starts the background re-pin / eviction task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._maintenance_loop(), name="model-residency")
+            logger.info(f"Model residency manager started (pinned: {self.pinned_model or 'none'}, "
+                        f"budget: {f'{self.memory_budget / GB:.1f} GB' if self.memory_budget else 'unlimited'}).")
+
+    async def stop(self):
+        """Stops the background task and any prewarms still loading."""
+        tasks = ([self._task] if self._task is not None else []) + list(self._loads.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+    # --- End Background maintenance ---
+
+    def stats(self) -> dict:
+        return {
+            "pinned_model": self.pinned_model,
+            "pin_keep_alive": self.pin_keep_alive,
+            "memory_budget_gb": round(self.memory_budget / GB, 2) if self.memory_budget else None,
+            "resident_gb": {ep.url: round(self._resident_bytes(ep) / GB, 2) for ep in self.router.endpoints},
+            "loading": sorted(model for _, model in self._loads),
+            "prewarms": self.prewarms,
+            "recent_evictions": self.evictions,
+        }
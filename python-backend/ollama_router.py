@@ -0,0 +1,154 @@
+# python-backend/ollama_router.py
+
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaEndpoint:
+    """Routing state of one Ollama instance."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.in_flight = 0
+        self.models: set[str] | None = None  # From /api/tags; None until the first successful check
+        self.running: list[dict] = []        # From /api/ps: models currently loaded in memory
+        self.active_models: dict[str, int] = {} # model -> generations in flight
+        self.last_used: dict[str, float] = {}   # model -> when a generation last started or finished
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.last_error: str | None = None
+        self.last_checked_at: float | None = None
+
+    @property
+    def resident(self) -> set[str]:
+        return {m.get("name") for m in self.running}
+
+    @property
+    def ejected(self) -> bool:
+        return time.time() < self.ejected_until
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": not self.ejected,
+            "in_flight": self.in_flight,
+            "models": sorted(self.models) if self.models is not None else None,
+            "resident": sorted(self.resident),
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_checked_at": self.last_checked_at,
+        }
+
+
+class OllamaRouter:
+    """
+    Chooses an Ollama endpoint for each generation.
+
+    Preference order among healthy (non-ejected) endpoints: the caller's sticky
+    endpoint (e.g. where a chat session's prefill is cached), then endpoints that
+    have the model resident in memory, then any endpoint that has the model,
+    breaking ties by fewest in-flight requests and then round-robin.
+
+    Passive health: `report_failure` after connection errors / 5xx responses;
+    `eject_after_failures` consecutive failures eject the endpoint for
+    `eject_seconds`, after which it is readmitted on trial. Active health checks
+    (the model catalog's periodic /api/tags + /api/ps poll) call `mark_checked`,
+    which readmits an endpoint immediately.
+    """
+
+    def __init__(self, urls: list[str], eject_after_failures: int = 3, eject_seconds: float = 30.0):
+        if not urls:
+            raise ValueError("At least one Ollama endpoint is required.")
+        self.endpoints = [OllamaEndpoint(url) for url in urls]
+        self.eject_after_failures = max(1, eject_after_failures)
+        self.eject_seconds = eject_seconds
+        self._round_robin = itertools.count()
+
+    def get(self, url: str | None) -> OllamaEndpoint | None:
+        if not url:
+            return None
+        url = url.rstrip('/')
+        return next((ep for ep in self.endpoints if ep.url == url), None)
+
+    def pick(self, model: str, sticky_url: str | None = None, exclude: set[str] | None = None) -> OllamaEndpoint | None:
+        """Returns the best endpoint for `model`, or None if every candidate is excluded."""
+        exclude = exclude or set()
+        candidates = [ep for ep in self.endpoints if ep.url not in exclude]
+        if not candidates:
+            return None
+        healthy = [ep for ep in candidates if not ep.ejected]
+        if not healthy:
+            # Everything is ejected: try the one whose ejection ends soonest rather than failing outright
+            return min(candidates, key=lambda ep: ep.ejected_until)
+
+        sticky = self.get(sticky_url)
+        if sticky in healthy and (sticky.models is None or model in sticky.models):
+            return sticky
+
+        with_model = [ep for ep in healthy if ep.models is not None and model in ep.models]
+        unknown = [ep for ep in healthy if ep.models is None]
+        pool = with_model or unknown or healthy
+        offset = next(self._round_robin)
+        rotated = pool[offset % len(pool):] + pool[:offset % len(pool)]
+        return min(rotated, key=lambda ep: (model not in ep.resident, ep.in_flight))
+
+    @asynccontextmanager
+    async def acquire(self, model: str, sticky_url: str | None = None, exclude: set[str] | None = None):
+        """Picks an endpoint and counts the request as in flight on it for the duration of the block."""
+        endpoint = self.pick(model, sticky_url, exclude)
+        if endpoint is None:
+            raise RuntimeError("No Ollama endpoint available.")
+        endpoint.in_flight += 1
+        endpoint.active_models[model] = endpoint.active_models.get(model, 0) + 1
+        endpoint.last_used[model] = time.time()
+        try:
+            yield endpoint
+        finally:
+            endpoint.in_flight -= 1
+            endpoint.active_models[model] -= 1
+            if not endpoint.active_models[model]:
+                del endpoint.active_models[model]
+            endpoint.last_used[model] = time.time()
+
+    def report_success(self, endpoint: OllamaEndpoint, model: str | None = None):
+        if endpoint.consecutive_failures or endpoint.ejected_until:
+            logger.info(f"Ollama endpoint {endpoint.url} recovered.")
+        endpoint.consecutive_failures = 0
+        endpoint.ejected_until = 0.0
+        endpoint.last_error = None
+        if model and model not in endpoint.resident:
+            endpoint.running.append({"name": model}) # Just served it, so it is loaded now
+
+    def report_failure(self, endpoint: OllamaEndpoint, error: str):
+        endpoint.consecutive_failures += 1
+        endpoint.last_error = error
+        if endpoint.consecutive_failures >= self.eject_after_failures and not endpoint.ejected:
+            endpoint.ejected_until = time.time() + self.eject_seconds
+            logger.warning(f"Ejecting Ollama endpoint {endpoint.url} for {self.eject_seconds:.0f}s after {endpoint.consecutive_failures} failures: {error}")
+
+    def mark_checked(self, endpoint: OllamaEndpoint, models: set[str], running: list[dict]):
+        """Records a successful active health check (model list and loaded models)."""
+        endpoint.models = models
+        endpoint.running = running
+        endpoint.last_checked_at = time.time()
+        self.report_success(endpoint)
+
+    def mark_check_failed(self, endpoint: OllamaEndpoint, error: str):
+        endpoint.last_checked_at = time.time()
+        # An unreachable endpoint during an active check is ejected straight away
+        endpoint.consecutive_failures = max(endpoint.consecutive_failures, self.eject_after_failures - 1)
+        self.report_failure(endpoint, error)
+
+    def snapshot(self) -> list[dict]:
+        return [ep.snapshot() for ep in self.endpoints]
+
+
+def is_endpoint_failure(error: str | None) -> bool:
+    """True for llm_client errors that indicate a sick endpoint (not a bad request)."""
+    if not error:
+        return False
+    return error.startswith(("Connection Error", "Timeout Error", "HTTP Error: 5"))
@@ -0,0 +1,179 @@
+# python-backend/response_cache.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalizes a prompt for cache keying: unifies line endings and strips trailing
+    whitespace per line and around the whole prompt. Inner whitespace is kept
+    because indentation is meaningful in pasted code.
+    """
+    lines = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def make_cache_key(model: str, prompt: str, image: str | None = None, options: dict | None = None) -> str:
+    """Builds a cache key from the model, normalized prompt hash, image hash and generation options."""
+    prompt_hash = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    image_hash = hashlib.sha256(image.encode("ascii", errors="ignore")).hexdigest() if image else ""
+    options_json = json.dumps(options or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{model}\0{prompt_hash}\0{image_hash}\0{options_json}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Bounded in-memory LRU cache of Ollama responses with a per-entry TTL and an
+    optional SQLite store so entries survive restarts.
+
+    Memory is checked first, without leaving the event loop; on a memory miss the
+    disk store (if any) is read in a worker thread and hits are promoted back into
+    memory. Writes go to memory immediately and to disk from a write-behind thread,
+    so a slow disk never blocks a request. All methods are thread-safe.
+
+    Args:
+        max_entries: Maximum number of entries kept in memory (LRU eviction beyond that).
+        ttl_seconds: Lifetime of an entry; expired entries count as misses.
+        disk_path: Optional SQLite file path for persistence. None keeps the cache memory-only.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600.0, disk_path: str | None = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict() # key -> (value, expires_at)
+        self._lock = threading.Lock() # Guards the in-memory entries and counters
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock() # Serializes use of the SQLite connection
+        self._writes: queue.SimpleQueue[tuple[str, str, float] | None] = queue.SimpleQueue()
+        self._writer: threading.Thread | None = None
+        if disk_path:
+            self._open_disk_store(disk_path)
+        if self._db is not None:
+            self._writer = threading.Thread(target=self._write_loop, name="response-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _open_disk_store(self, disk_path: str):
+        try:
+            directory = os.path.dirname(os.path.abspath(disk_path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+            logger.info(f"Response cache persisted to {disk_path}")
+        except sqlite3.Error as e:
+            logger.error(f"Could not open response cache store at {disk_path}: {e}. Using memory only.")
+            self._db = None
+
+    async def get(self, key: str) -> str | None:
+        """Returns the cached value for `key`, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            if self._db is None:
+                self.misses += 1
+                return None
+
+        row = await asyncio.to_thread(self._read_from_disk, key)
+        with self._lock:
+            if key in self._entries: # put() while the disk was read; the memory entry is newer
+                row = self._entries[key]
+            if row is not None and row[1] >= now:
+                self._store_in_memory(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        """Stores `value` under `key` with the configured TTL (persisted in the background)."""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store_in_memory(key, value, expires_at)
+        if self._writer is not None:
+            self._writes.put((key, value, expires_at))
+
+    def _read_from_disk(self, key: str) -> tuple[str, float] | None:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            try:
+                return self._db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Response cache disk read failed: {e}")
+                return None
+
+    def _write_loop(self):
+        """Persists queued entries, committing each burst of writes once."""
+        while True:
+            item = self._writes.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                with self._db_lock:
+                    try:
+                        self._db.executemany("INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)", batch)
+                        self._db.commit()
+                    except sqlite3.Error as e:
+                        logger.error(f"Response cache disk write failed: {e}")
+            if item is None:
+                return # close() was called
+
+    def _store_in_memory(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        """Flushes pending writes and closes the disk store, if any."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
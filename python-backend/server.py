@@ -1,12 +1,16 @@
 # python-backend/server.py
 
 import asyncio
+import base64
 import configparser
+import json
 import os
+import secrets
 import sys
+import time
 import traceback
-import httpx
 import logging # <-- Added for logging
+from contextlib import aclosing, asynccontextmanager
 
 # Add the directory containing this file to the Python path
 # (Ensures local imports work correctly)
@@ -17,9 +21,19 @@ if current_dir not in sys.path:
 # --- Local Imports ---
 try:
     # Existing LLM client for Ollama interaction
-    from llm_client import get_ollama_suggestion
+    import llm_client
+    from llm_client import get_ollama_suggestion, stream_ollama_suggestion, get_ollama_chat_reply, stream_ollama_chat
+    from response_cache import ResponseCache, make_cache_key
+    from model_catalog import ModelCatalog
+    from ollama_router import OllamaRouter, is_endpoint_failure
+    from image_processing import ImageProcessor
+    from sessions import SessionStore
+    from admission import AdmissionController, AdmissionRejected
+    from model_residency import ModelResidencyManager
+    import metrics
     # --- NEW ASR Import ---
     import asr_client # Import the new ASR client module
+    import asr_worker
     # --- End NEW ASR Import ---
 except ImportError as e:
     # Use logger if available, otherwise print
@@ -33,8 +47,9 @@ except ImportError as e:
 
 import uvicorn
 # --- Imports for FastAPI, Models, CORS, and new Endpoint ---
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 # --- End Imports ---
 
@@ -55,12 +70,245 @@ logger = logging.getLogger(__name__)
 
 
 # --- Configuration Loading ---
-ollama_url: str | None = None
+ollama_url: str | None = None # First (primary) endpoint
+ollama_urls: list[str] = [] # All endpoints from ApiBaseUrl (comma-separated)
+routing_settings: dict = {}
+ollama_router: OllamaRouter | None = None
 ollama_model: str | None = None
+http_client_settings: dict = {}
+models_timeout: float = 15.0
+model_refresh_interval: float = 30.0
+model_catalog: ModelCatalog | None = None
+asr_batch_settings: dict = {}
+asr_stream_chunk_seconds: float = 4.0
+asr_stream_interim_seconds: float = 1.0
+asr_warm_up: bool = True
+asr_inference_settings: dict = {} # CPU/GPU inference profile, see asr_client.DEFAULT_INFERENCE_PROFILE
+asr_long_audio_settings: dict = {} # Windowed transcription of long recordings, see asr_client.DEFAULT_LONG_AUDIO_SETTINGS
+asr_mode: str = "local" # "local" (model in this process) or "worker" (shared asr_worker.py process)
+asr_worker_address: str | tuple[str, int] | None = None
+asr_worker_authkey: bytes | None = None # None = no private key configured (worker requests fail)
+asr_worker_client: asr_worker.ASRWorkerClient | None = None
+vad_settings: dict = {}
+cache_settings: dict = {}
+image_settings: dict = {}
+process_json_images: bool = True
+image_processor: ImageProcessor | None = None
+session_settings: dict = {}
+session_keep_alive: str = "30m"
+session_store: SessionStore | None = None
+response_cache: ResponseCache | None = None
+admission_settings: dict = {}
+admission: AdmissionController | None = None
+batch_settings: dict = {"max_items": 64, "max_concurrency": 4}
+residency_settings: dict = {}
+residency_manager: ModelResidencyManager | None = None
+
+def load_http_client_settings(config: configparser.ConfigParser):
+    """Reads the [HttpClient] section (pool limits, keep-alive and timeouts), falling back to defaults."""
+    global http_client_settings, models_timeout
+    try:
+        http_client_settings = {
+            "max_connections": config.getint('HttpClient', 'MaxConnections', fallback=20),
+            "max_keepalive_connections": config.getint('HttpClient', 'MaxKeepaliveConnections', fallback=10),
+            "keepalive_expiry": config.getfloat('HttpClient', 'KeepaliveExpiry', fallback=30.0),
+            "connect_timeout": config.getfloat('HttpClient', 'ConnectTimeout', fallback=60.0),
+            "read_timeout": config.getfloat('HttpClient', 'ReadTimeout', fallback=300.0),
+        }
+        models_timeout = config.getfloat('HttpClient', 'ModelsTimeout', fallback=15.0)
+    except ValueError as e:
+        logger.error(f"Invalid value in [HttpClient] section of config.ini: {e}. Using defaults.")
+        http_client_settings = {}
+        models_timeout = 15.0
+    logger.info(f"--- HTTP client settings: {http_client_settings or 'defaults'} ---")
+
+def load_asr_settings(config: configparser.ConfigParser):
+    """Reads the [ASR] section (transcription micro-batching), falling back to defaults."""
+    global asr_batch_settings, asr_stream_chunk_seconds, asr_stream_interim_seconds, asr_warm_up
+    global asr_mode, asr_worker_address, asr_worker_authkey, asr_inference_settings, asr_long_audio_settings
+    try:
+        asr_batch_settings = {
+            "window_ms": config.getfloat('ASR', 'BatchWindowMs', fallback=30.0),
+            "max_batch_size": config.getint('ASR', 'MaxBatchSize', fallback=8),
+            "max_batch_seconds": config.getfloat('ASR', 'MaxBatchSeconds', fallback=120.0),
+        }
+        asr_stream_chunk_seconds = config.getfloat('ASR', 'StreamChunkSeconds', fallback=4.0)
+        asr_stream_interim_seconds = config.getfloat('ASR', 'StreamInterimSeconds', fallback=1.0)
+        asr_warm_up = config.getboolean('ASR', 'WarmUp', fallback=True)
+        asr_mode = config.get('ASR', 'Mode', fallback='local').strip().lower()
+        if asr_mode not in ("local", "worker"):
+            logger.error(f"Unknown [ASR] Mode '{asr_mode}'. Using 'local'.")
+            asr_mode = "local"
+        asr_worker_address = asr_worker.parse_worker_address(config.get('ASR', 'WorkerAddress', fallback=''))
+        asr_worker_authkey = asr_worker.resolve_authkey(config.get('ASR', 'WorkerAuthKey', fallback=''))
+        asr_inference_settings = asr_worker.read_inference_settings(config)
+        asr_long_audio_settings = {
+            "threshold_seconds": config.getfloat('ASR', 'LongAudioThresholdSeconds', fallback=60.0),
+            "window_seconds": config.getfloat('ASR', 'LongAudioWindowSeconds', fallback=30.0),
+            "overlap_seconds": config.getfloat('ASR', 'LongAudioOverlapSeconds', fallback=1.0),
+            "max_in_flight": config.getint('ASR', 'LongAudioMaxInFlight', fallback=4),
+        }
+        asr_client.configure_long_audio(**asr_long_audio_settings) # Validates the combination
+    except ValueError as e:
+        logger.error(f"Invalid value in [ASR] section of config.ini: {e}. Using defaults.")
+        asr_batch_settings = {}
+        asr_stream_chunk_seconds, asr_stream_interim_seconds = 4.0, 1.0
+        asr_inference_settings = {}
+        asr_long_audio_settings = {}
+        asr_client.configure_long_audio()
+        asr_worker_address = asr_worker.default_worker_address()
+    logger.info(f"--- ASR mode: {asr_mode}, batching settings: {asr_batch_settings or 'defaults'}, inference profile: {asr_inference_settings or 'defaults'}, "
+                f"long audio: {asr_long_audio_settings or 'defaults'} ---")
+
+def load_vad_settings(config: configparser.ConfigParser):
+    """Reads the [VAD] section (silence trimming before ASR inference), falling back to defaults."""
+    global vad_settings
+    try:
+        vad_settings = {
+            "threshold_db": config.getfloat('VAD', 'ThresholdDb', fallback=-50.0),
+            "noise_margin_db": config.getfloat('VAD', 'NoiseMarginDb', fallback=10.0),
+            "padding_ms": config.getfloat('VAD', 'PaddingMs', fallback=250.0),
+            "min_speech_ms": config.getfloat('VAD', 'MinSpeechMs', fallback=60.0),
+            "compact_pauses_ms": config.getfloat('VAD', 'CompactPausesMs', fallback=0.0),
+        } if config.getboolean('VAD', 'Enabled', fallback=True) else {}
+    except ValueError as e:
+        logger.error(f"Invalid value in [VAD] section of config.ini: {e}. Using defaults.")
+        vad_settings = {"threshold_db": -50.0, "noise_margin_db": 10.0, "padding_ms": 250.0, "min_speech_ms": 60.0, "compact_pauses_ms": 0.0}
+    logger.info(f"--- VAD settings: {vad_settings or 'disabled'} ---")
+
+def load_cache_settings(config: configparser.ConfigParser):
+    """Reads the [Cache] section (response cache for /api/ask), falling back to defaults."""
+    global cache_settings
+    try:
+        enabled = config.getboolean('Cache', 'Enabled', fallback=True)
+        disk_path = config.get('Cache', 'DiskPath', fallback='').strip()
+        if disk_path and not os.path.isabs(disk_path):
+            disk_path = os.path.join(os.path.dirname(__file__), disk_path)
+        cache_settings = {
+            "max_entries": config.getint('Cache', 'MaxEntries', fallback=256),
+            "ttl_seconds": config.getfloat('Cache', 'TTLSeconds', fallback=3600.0),
+            "disk_path": disk_path or None,
+        } if enabled else {}
+    except ValueError as e:
+        logger.error(f"Invalid value in [Cache] section of config.ini: {e}. Response cache disabled.")
+        cache_settings = {}
+    logger.info(f"--- Response cache settings: {cache_settings or 'disabled'} ---")
+
+def load_image_settings(config: configparser.ConfigParser):
+    """Reads the [Images] section (server-side downscaling for multimodal asks), falling back to defaults."""
+    global image_settings, process_json_images
+    try:
+        image_settings = {
+            "max_dimension": config.getint('Images', 'MaxDimension', fallback=1024),
+            "jpeg_quality": config.getint('Images', 'JpegQuality', fallback=85),
+            "cache_entries": config.getint('Images', 'CacheEntries', fallback=64),
+        } if config.getboolean('Images', 'Downscale', fallback=True) else {}
+        process_json_images = config.getboolean('Images', 'ProcessJsonImages', fallback=True)
+    except ValueError as e:
+        logger.error(f"Invalid value in [Images] section of config.ini: {e}. Using defaults.")
+        image_settings = {"max_dimension": 1024, "jpeg_quality": 85, "cache_entries": 64}
+        process_json_images = True
+    logger.info(f"--- Image processing settings: {image_settings or 'disabled'} ---")
+
+def load_session_settings(config: configparser.ConfigParser):
+    """Reads the [Sessions] section (server-side chat history), falling back to defaults."""
+    global session_settings, session_keep_alive
+    try:
+        session_settings = {
+            "max_sessions": config.getint('Sessions', 'MaxSessions', fallback=100),
+            "ttl_seconds": config.getfloat('Sessions', 'TTLSeconds', fallback=1800.0),
+            "max_history_tokens": config.getint('Sessions', 'MaxHistoryTokens', fallback=6000),
+        } if config.getboolean('Sessions', 'Enabled', fallback=True) else {}
+        session_keep_alive = config.get('Sessions', 'KeepAlive', fallback='30m')
+    except ValueError as e:
+        logger.error(f"Invalid value in [Sessions] section of config.ini: {e}. Using defaults.")
+        session_settings = {"max_sessions": 100, "ttl_seconds": 1800.0, "max_history_tokens": 6000}
+        session_keep_alive = "30m"
+    logger.info(f"--- Chat session settings: {session_settings or 'disabled'} ---")
+
+def load_routing_settings(config: configparser.ConfigParser):
+    """Reads the [Routing] section (multi-endpoint health checks), falling back to defaults."""
+    global routing_settings
+    try:
+        routing_settings = {
+            "eject_after_failures": config.getint('Routing', 'EjectAfterFailures', fallback=3),
+            "eject_seconds": config.getfloat('Routing', 'EjectSeconds', fallback=30.0),
+        }
+    except ValueError as e:
+        logger.error(f"Invalid value in [Routing] section of config.ini: {e}. Using defaults.")
+        routing_settings = {}
+
+def load_admission_settings(config: configparser.ConfigParser):
+    """Reads the [Admission] section (per-model concurrency limits and wait queue), falling back to defaults."""
+    global admission_settings
+    try:
+        model_limits = {}
+        for item in config.get('Admission', 'ModelLimits', fallback='').split(','):
+            if item.strip():
+                model, _, limit = item.rpartition('=')
+                model_limits[model.strip()] = int(limit)
+        admission_settings = {
+            "max_concurrent": config.getint('Admission', 'MaxConcurrentPerModel', fallback=2),
+            "max_queue": config.getint('Admission', 'MaxQueuePerModel', fallback=8),
+            "queue_timeout": config.getfloat('Admission', 'QueueTimeout', fallback=30.0),
+            "model_limits": model_limits,
+        } if config.getboolean('Admission', 'Enabled', fallback=True) else {}
+    except ValueError as e:
+        logger.error(f"Invalid value in [Admission] section of config.ini: {e}. Using defaults.")
+        admission_settings = {"max_concurrent": 2, "max_queue": 8, "queue_timeout": 30.0}
+    logger.info(f"--- Admission control settings: {admission_settings or 'disabled'} ---")
+
+def load_batch_settings(config: configparser.ConfigParser):
+    """Reads the [Batch] section (limits for /api/ask/batch), falling back to defaults."""
+    global batch_settings
+    try:
+        batch_settings = {
+            "max_items": max(1, config.getint('Batch', 'MaxItems', fallback=64)),
+            "max_concurrency": max(1, config.getint('Batch', 'MaxConcurrency', fallback=4)),
+        }
+    except ValueError as e:
+        logger.error(f"Invalid value in [Batch] section of config.ini: {e}. Using defaults.")
+        batch_settings = {"max_items": 64, "max_concurrency": 4}
+    logger.info(f"--- Batch ask settings: {batch_settings} ---")
+
+def load_residency_settings(config: configparser.ConfigParser):
+    """Reads the [Residency] section (model prewarming, pinning and eviction), falling back to defaults."""
+    global residency_settings
+    try:
+        pin_keep_alive = config.get('Residency', 'PinKeepAlive', fallback='24h').strip()
+        residency_settings = {
+            "pin_default_model": config.getboolean('Residency', 'PinDefaultModel', fallback=True),
+            # Ollama takes durations as strings ("24h") and plain numbers as seconds (-1 = forever)
+            "pin_keep_alive": int(pin_keep_alive) if pin_keep_alive.lstrip('-').isdigit() else pin_keep_alive,
+            "memory_budget_gb": config.getfloat('Residency', 'MemoryBudgetGB', fallback=0.0),
+            "min_idle_seconds": config.getfloat('Residency', 'MinIdleSeconds', fallback=120.0),
+            "check_interval": config.getfloat('Residency', 'CheckInterval', fallback=30.0),
+        } if config.getboolean('Residency', 'Enabled', fallback=True) else {}
+    except ValueError as e:
+        logger.error(f"Invalid value in [Residency] section of config.ini: {e}. Using defaults.")
+        residency_settings = {"pin_default_model": True, "pin_keep_alive": "24h", "memory_budget_gb": 0.0, "min_idle_seconds": 120.0, "check_interval": 30.0}
+    logger.info(f"--- Model residency settings: {residency_settings or 'disabled'} ---")
+
+def _parse_endpoints(value: str) -> list[str]:
+    return [url.strip().rstrip('/') for url in value.split(',') if url.strip()]
+
+def load_section_settings(config):
+    """Applies every non-Ollama config section (missing sections and keys fall back to defaults)."""
+    load_http_client_settings(config)
+    load_asr_settings(config)
+    load_vad_settings(config)
+    load_cache_settings(config)
+    load_image_settings(config)
+    load_session_settings(config)
+    load_routing_settings(config)
+    load_admission_settings(config)
+    load_batch_settings(config)
+    load_residency_settings(config)
+
 
 def load_config():
     """Loads Ollama configuration from config.ini"""
-    global ollama_url, ollama_model
+    global ollama_url, ollama_urls, ollama_model, model_refresh_interval
     config = configparser.ConfigParser()
     # Determine config path relative to this file
     config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
@@ -72,18 +320,23 @@ def load_config():
         ollama_model = 'gemma2:latest' # Consider a more common default maybe?
         logger.info(f"--- Using default Ollama URL: {ollama_url} ---")
         logger.info(f"--- Using default Ollama Model: {ollama_model} (Ensure this model is available!) ---")
+        load_section_settings(config)
+        ollama_urls = [ollama_url]
         return
 
     try:
         config.read(config_path)
         ollama_section = config['Ollama'] if 'Ollama' in config else {}
-        ollama_url = ollama_section.get('ApiBaseUrl', 'http://localhost:11434')
+        ollama_urls = _parse_endpoints(ollama_section.get('ApiBaseUrl', 'http://localhost:11434')) or ['http://localhost:11434']
+        ollama_url = ollama_urls[0]
         ollama_model = ollama_section.get('Model', None) # Default to None if not set
-        logger.info(f"--- Loaded Ollama URL from config: {ollama_url} ---")
+        model_refresh_interval = float(ollama_section.get('ModelRefreshInterval', 30.0))
+        logger.info(f"--- Loaded Ollama URL(s) from config: {', '.join(ollama_urls)} ---")
         if ollama_model:
              logger.info(f"--- Loaded Default Ollama Model from config: {ollama_model} ---")
         else:
              logger.info(f"--- Default Ollama Model not set in config.ini (will require selection in UI) ---")
+        load_section_settings(config)
 
     except configparser.Error as e:
         logger.error(f"Error reading config.ini: {e}", exc_info=True)
@@ -92,10 +345,18 @@ def load_config():
         ollama_model = None # Reset model on config error
         logger.warning("--- Using default fallback Ollama URL due to config error ---")
         logger.warning("--- Default Ollama Model unset due to config error ---")
+        ollama_urls = [ollama_url]
+        load_section_settings(configparser.ConfigParser())
+    except ValueError as e:
+        logger.error(f"Invalid ModelRefreshInterval in config.ini: {e}. Using 30s.")
+        model_refresh_interval = 30.0
+        load_section_settings(config)
     except KeyError:
          logger.error("Config file found, but missing 'Ollama' section or keys ('ApiBaseUrl', 'Model'). Using defaults.")
          ollama_url = ollama_url or 'http://localhost:11434'
+         ollama_urls = ollama_urls or [ollama_url]
          ollama_model = None
+         load_section_settings(configparser.ConfigParser())
 
 
 # --- Pydantic Models ---
@@ -104,11 +365,32 @@ class AskRequest(BaseModel):
     prompt: str
     model: str | None = None  # Allow frontend to override default model
     image: str | None = None  # Base64 encoded image string
+    options: dict | None = None  # Ollama generation options (temperature, num_ctx, ...)
+    bypass_cache: bool = False  # Skip the response cache lookup (the fresh answer still refreshes it)
+    session_id: str | None = None  # Continue a server-side conversation (uses Ollama /api/chat)
 
 # Model for Ollama interaction response
 class AskResponse(BaseModel):
     suggestion: str | None = None
     error: str | None = None
+    cached: bool = False  # True if served from the response cache
+    session_id: str | None = None  # Echoed back for conversation requests
+
+class BatchAskItem(BaseModel):
+    id: str | None = None  # Echoed in the result; defaults to the item's position
+    prompt: str
+    model: str | None = None
+    image: str | None = None  # Base64 encoded image string
+    options: dict | None = None
+
+class BatchAskRequest(BaseModel):
+    items: list[BatchAskItem]
+    max_concurrency: int | None = None  # Capped by [Batch] MaxConcurrency
+    race: bool = False  # Stop at the first successful answer and cancel the rest
+    bypass_cache: bool = False
+
+class PrewarmRequest(BaseModel):
+    model: str | None = None  # Defaults to the configured model
 
 # --- NEW Pydantic Model for Transcription Response ---
 class TranscriptionResponse(BaseModel):
@@ -138,7 +420,10 @@ app.add_middleware(
     allow_credentials=True,        # Allow cookies if needed in the future
     allow_methods=["*"],           # Allow all HTTP methods (GET, POST, etc.)
     allow_headers=["*"],           # Allow all headers
+    expose_headers=["Server-Timing"],
 )
+# Per-stage timings as a Server-Timing header, request durations for /metrics
+app.add_middleware(metrics.TimingMiddleware)
 
 # --- Server Startup Event ---
 @app.on_event("startup")
@@ -146,88 +431,202 @@ async def startup_event():
     """Tasks to run when the server starts."""
     logger.info("Backend server starting up...")
     load_config() # Load Ollama config first
-    # Attempt to load the ASR model after config is loaded
-    try:
-        await asr_client.load_asr_model() # Load the ASR model from asr_client
-    except Exception as e:
-        # Log critical error if model fails to load but allow server to start
-        # The transcription endpoint will then fail gracefully if model is unavailable
-        logger.critical(f"ASR MODEL FAILED TO LOAD ON STARTUP: {e}", exc_info=True)
+    llm_client.init_http_client(**http_client_settings) # Shared, pooled client for all Ollama calls
+    global response_cache, model_catalog, image_processor, session_store, ollama_router, admission, residency_manager
+    if admission_settings and admission is None:
+        admission = AdmissionController(**admission_settings, keep_models=[ollama_model] if ollama_model else [])
+    if session_settings and session_store is None:
+        session_store = SessionStore(**session_settings)
+    if cache_settings and response_cache is None:
+        response_cache = ResponseCache(**cache_settings)
+    if image_settings and image_processor is None:
+        image_processor = ImageProcessor(**image_settings)
+    if ollama_urls:
+        # Routes generations across endpoints; the catalog's background poll of every
+        # endpoint doubles as the router's active health check
+        ollama_router = OllamaRouter(ollama_urls, **routing_settings)
+        model_catalog = ModelCatalog(ollama_router, model_refresh_interval, models_timeout)
+        model_catalog.start()
+        if residency_settings and residency_manager is None:
+            # Takes model loads off the request path: prewarm on selection, pin the default, evict idle models
+            settings = dict(residency_settings)
+            pinned_model = ollama_model if settings.pop("pin_default_model") else None
+            residency_manager = ModelResidencyManager(ollama_router, model_catalog, pinned_model, **settings)
+            residency_manager.start()
+    asr_client.configure_vad(**vad_settings) # Runs in this process, before audio goes to the model or worker
+    if asr_mode == "worker":
+        # The model (and batcher) live in asr_worker.py, shared by all uvicorn workers
+        global asr_worker_client
+        if asr_worker_authkey is None:
+            logger.error("[ASR] Mode = worker needs a private WorkerAuthKey (the published default is refused) "
+                         "unless server.py spawns the worker. Transcription will be unavailable.")
+        asr_worker_client = asr_worker.ASRWorkerClient(asr_worker_address, asr_worker_authkey)
+        asr_client.use_remote_worker(asr_worker_client)
+        asr_worker_client.start()
+        logger.info(f"Using out-of-process ASR worker at {asr_worker_address}")
+    else:
+        # Load the ASR model in a background thread so the server (and /api/ask) is usable
+        # immediately; transcription endpoints answer 503 until /api/status reports "ready".
+        asr_client.configure_inference(**asr_inference_settings)
+        asr_client.start_background_load(warm_up=asr_warm_up)
+        asr_client.start_batcher(**asr_batch_settings) # Groups concurrent transcriptions into batched inference
     logger.info("Backend server startup complete.")
 # --- End Server Startup Event ---
 
+# --- Server Shutdown Event ---
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Tasks to run when the server shuts down."""
+    logger.info("Backend server shutting down...")
+    if residency_manager is not None:
+        await residency_manager.stop()
+    if model_catalog is not None:
+        await model_catalog.stop()
+    await llm_client.close_http_client() # Release pooled Ollama connections
+    await asr_client.stop_batcher()
+    if asr_worker_client is not None:
+        await asr_worker_client.stop()
+    if response_cache is not None:
+        response_cache.close()
+    logger.info("Backend server shutdown complete.")
+# --- End Server Shutdown Event ---
+
 
 # --- API Endpoints ---
 
 @app.get("/api/status", tags=["Status"])
 async def get_status():
-    """Checks if the server is running and returns the default Ollama model."""
+    """Checks if the server is running and returns the default Ollama model and cached Ollama health."""
     logger.info("GET /api/status called")
     # Check if the ASR model loaded successfully
-    asr_status = "Loaded" if asr_client._asr_model is not None else "Failed/Not Loaded"
+    asr_state = asr_client.get_asr_status()
+    if asr_state["state"] == asr_client.ASR_READY:
+        asr_status = "Loaded"
+    elif asr_state["state"] in (asr_client.ASR_LOADING, asr_client.ASR_WARMING):
+        asr_status = "Loading"
+    else:
+        asr_status = "Failed/Not Loaded"
     return {
         "status": "AIFred Backend Running",
         "default_ollama_model": ollama_model,
-        "asr_model_status": asr_status
+        "asr_model_status": asr_status,
+        "asr": asr_state, # not_loaded / loading (with progress) / warming / ready / failed
+        "ollama": model_catalog.health() if model_catalog is not None else None,
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "image_cache": image_processor.stats() if image_processor is not None else None,
+        "sessions": session_store.stats() if session_store is not None else None,
+        "admission": admission.stats() if admission is not None else None,
+        "residency": residency_manager.stats() if residency_manager is not None else None,
     }
 
+@app.get("/metrics", tags=["Status"], response_class=PlainTextResponse)
+async def get_metrics():
+    """Latency histograms (HTTP routes, ASR and Ollama stages, TTFT, tokens/s) in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/api/models", tags=["Ollama"])
-async def get_models():
-    """Gets the list of locally available models from Ollama."""
-    if not ollama_url:
+async def get_models(refresh: bool = False):
+    """
+    Returns the models available in Ollama from the in-process catalog.
+
+    The catalog is refreshed in the background, so this normally answers
+    immediately; `stale_seconds` tells how old the listing is. Pass
+    `refresh=true` to force a synchronous refresh first.
+    """
+    if not ollama_url or model_catalog is None:
          logger.error("GET /api/models: Ollama URL not configured.")
          # Use HTTPException for clear error reporting to client
          raise HTTPException(status_code=503, detail="Ollama URL not configured in backend.")
 
-    ollama_tags_url = f"{ollama_url.rstrip('/')}/api/tags"
-    logger.info(f"GET /api/models - Querying Ollama models at: {ollama_tags_url}")
-    models = []
-    error_message = None
-    try:
-        # Increased timeout slightly for potentially slow Ollama responses
-        timeout = httpx.Timeout(15.0, connect=5.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.get(ollama_tags_url)
-            logger.debug(f"Ollama /api/tags response status: {response.status_code}")
-            response.raise_for_status() # Raise exception for non-2xx status codes
-            data = response.json()
-
-            if "models" in data and isinstance(data["models"], list):
-                # Filter out potentially null names and sort
-                models = sorted([m.get("name") for m in data["models"] if m.get("name")])
-                logger.info(f"Found {len(models)} models from Ollama.")
-            else:
-               error_message = "Unexpected response format from Ollama /api/tags"
-               logger.warning(f"{error_message}. Response data: {data}")
-               # Report this as an internal server error, as backend can't parse Ollama response
-               raise HTTPException(status_code=502, detail=error_message) # 502 Bad Gateway
-
-    except httpx.TimeoutException:
-         error_message = f"Timeout connecting to Ollama model list at {ollama_tags_url}"
-         logger.error(error_message, exc_info=True)
-         raise HTTPException(status_code=504, detail=error_message) # 504 Gateway Timeout
-    except httpx.HTTPStatusError as e:
-        error_message = f"Ollama API error ({e.response.status_code}): {str(e.response.text)[:200]}"
-        logger.error(f"Error getting models from Ollama: {error_message}", exc_info=True)
-        # Forward Ollama's error status code if possible, otherwise use 502
-        raise HTTPException(status_code=e.response.status_code or 502, detail=error_message)
-    except httpx.RequestError as e:
-        error_message = f"Cannot connect to Ollama at {ollama_url}. Is it running?"
-        logger.error(error_message, exc_info=True)
-        raise HTTPException(status_code=503, detail=error_message) # 503 Service Unavailable
-    except Exception as e:
-        error_message = f"An unexpected error occurred while fetching models: {e}"
-        logger.error(error_message, exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error fetching models.")
+    # Only wait on Ollama if asked to, or if no listing has ever succeeded
+    if refresh or model_catalog.updated_at is None:
+        logger.info(f"GET /api/models - Refreshing model catalog from {len(ollama_urls)} endpoint(s)")
+        await model_catalog.refresh()
 
-    logger.info(f"GET /api/models - Returning {len(models)} models.")
-    # Return directly on success, errors are raised as HTTPErrors
-    return {"models": models, "error": None} # Explicitly return None for error on success
+    if model_catalog.updated_at is None:
+        error_message = model_catalog.last_error or "Model list not available yet."
+        logger.error(f"GET /api/models - No model list available: {error_message}")
+        raise HTTPException(status_code=model_catalog.last_error_status or 503, detail=error_message)
+
+    snapshot = model_catalog.snapshot()
+    logger.info(f"GET /api/models - Returning {len(snapshot['models'])} models (stale {snapshot['stale_seconds']}s).")
+    return snapshot
+
+@app.post("/api/models/prewarm", tags=["Ollama"])
+async def prewarm_model(request: PrewarmRequest):
+    """
+    Loads a model in Ollama ahead of use (e.g. as soon as it is selected in the UI),
+    so the next /api/ask doesn't pay the cold load. Answers once the model is loaded;
+    returns immediately if it already is. May unload idle models to stay within
+    the [Residency] memory budget.
+    """
+    model_to_use = request.model or ollama_model
+    if not model_to_use:
+        raise HTTPException(status_code=400, detail="No model specified and no default model configured.")
+    if ollama_router is None:
+        raise HTTPException(status_code=503, detail="Ollama URL not configured in backend.")
+    if residency_manager is None:
+        raise HTTPException(status_code=503, detail="Model residency management is disabled in config.ini.")
+    logger.info(f"POST /api/models/prewarm - model: {model_to_use}")
+    result = await residency_manager.prewarm(model_to_use)
+    if result["error"]:
+        status = 502 if is_endpoint_failure(result["error"]) else 400
+        raise HTTPException(status_code=status, detail=f"Failed to load {model_to_use}: {result['error']}")
+    return result
 
 
 @app.post("/api/ask", response_model=AskResponse, tags=["Ollama"])
-async def ask_ollama(request: AskRequest):
+async def ask_ollama(request: AskRequest, http_request: Request):
     """Receives a prompt (and optional image), sends it to Ollama, returns suggestion."""
+    return await _ask(request, process_image=True, http_request=http_request)
+
+
+def _admission_error(e: AdmissionRejected) -> HTTPException:
+    """429 when the model's wait queue is full, 503 when the wait timed out; both with Retry-After."""
+    logger.warning(f"Admission rejected: {e}")
+    return HTTPException(status_code=429 if e.queue_full else 503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+@asynccontextmanager
+async def _admitted(model: str):
+    """Holds a generation slot for `model` (no-op when admission control is disabled)."""
+    if admission is None:
+        yield
+        return
+    started = time.perf_counter()
+    async with admission.admit(model):
+        metrics.record_stage("admission_wait", time.perf_counter() - started)
+        yield
+
+
+async def _until_disconnected(coro, http_request: Request | None, poll_interval: float = 0.5):
+    """
+    Awaits `coro` while watching for the client to go away. If it disconnects, the
+    work is cancelled, which closes the upstream Ollama connection and makes
+    Ollama abort the generation instead of finishing an answer nobody will read.
+    """
+    task = asyncio.ensure_future(coro)
+    if http_request is None:
+        return await task
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info("Client disconnected; cancelling the upstream generation.")
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                raise HTTPException(status_code=499, detail="Client closed request.")
+    finally:
+        task.cancel() # No-op once finished; stops the work if this handler itself is cancelled
+
+
+async def _ask(request: AskRequest, process_image: bool, http_request: Request | None = None) -> AskResponse:
+    """Shared implementation of /api/ask and /api/ask/upload."""
     image_presence = "Yes" if request.image else "No"
     logger.info(f"POST /api/ask - Prompt: '{request.prompt[:50]}...', Model: {request.model or 'Default'}, Image: {image_presence}")
 
@@ -241,17 +640,29 @@ async def ask_ollama(request: AskRequest):
         raise HTTPException(status_code=400, detail="Ollama model not specified or configured.")
 
     logger.info(f"--- Using model '{model_to_use}' for Ollama request ---")
+    if process_image:
+        request = await _prepare_image(request)
     if request.image:
         logger.info(f"--- Sending image data to model '{model_to_use}'. Ensure it supports multimodal input. ---")
 
+    session = _get_session(request, model_to_use)
+
+    # Serve repeated questions from the response cache (conversation turns depend on history, so skip those)
+    cache_key = None
+    if response_cache is not None and session is None:
+        cache_key = make_cache_key(model_to_use, request.prompt, request.image, request.options)
+        if not request.bypass_cache:
+            cached_suggestion = await response_cache.get(cache_key)
+            if cached_suggestion is not None:
+                logger.info("Suggestion served from response cache.")
+                return AskResponse(suggestion=cached_suggestion, cached=True)
+
+    async def generate():
+        async with _admitted(model_to_use):
+            return await _generate_routed(request, model_to_use, session)
+
     try:
-        # Call the llm_client function to interact with Ollama
-        suggestion, error = await get_ollama_suggestion(
-            endpoint=ollama_url,
-            model=model_to_use,
-            prompt=request.prompt,
-            base64_image=request.image
-        )
+        suggestion, error = await _until_disconnected(generate(), http_request)
 
         # Handle response from llm_client
         if error:
@@ -259,22 +670,339 @@ async def ask_ollama(request: AskRequest):
             # Determine appropriate status code based on error type if possible
             if "connect" in error.lower():
                  raise HTTPException(status_code=503, detail=f"Ollama connection failed: {error}")
+            elif error.startswith("Timeout Error"):
+                 raise HTTPException(status_code=504, detail=f"Ollama request timed out: {error}")
             else:
                  raise HTTPException(status_code=502, detail=f"Ollama interaction failed: {error}") # 502 Bad Gateway
         elif suggestion is not None:
             logger.info("Suggestion received successfully from Ollama.")
-            return AskResponse(suggestion=suggestion)
+            if cache_key is not None:
+                response_cache.put(cache_key, suggestion)
+            return AskResponse(suggestion=suggestion, session_id=request.session_id if session else None)
         else:
             # This case should ideally not happen if llm_client returns either suggestion or error
             logger.warning("llm_client returned neither suggestion nor error.")
             raise HTTPException(status_code=500, detail="Received no response content from Ollama client.")
 
+    except HTTPException:
+        raise # Already carries the right status code
+    except AdmissionRejected as e:
+        raise _admission_error(e)
     except Exception as e:
         # Catch-all for unexpected errors during the request handling
         logger.error(f"An unexpected error occurred in /api/ask handler: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
 
+def _get_session(request: AskRequest, model: str):
+    """Returns the chat session for a conversation request, or None for one-shot asks."""
+    if not request.session_id:
+        return None
+    if session_store is None:
+        raise HTTPException(status_code=400, detail="Chat sessions are disabled in backend config.")
+    return session_store.get_or_create(request.session_id, model)
+
+
+async def _generate_routed(request: AskRequest, model: str, session) -> tuple[str | None, str | None]:
+    """
+    Runs a non-streamed generation on the best Ollama endpoint for `model`.
+    Connection failures are retried once per remaining endpoint; the router is
+    told about every outcome so sick endpoints get ejected.
+    """
+    tried: set[str] = set()
+    suggestion, error = None, "No Ollama endpoint available."
+    for _ in range(len(ollama_router.endpoints)):
+        sticky_url = session.endpoint_url if session is not None else None
+        async with ollama_router.acquire(model, sticky_url, exclude=tried) as endpoint:
+            logger.info(f"--- Routing to Ollama endpoint {endpoint.url} ({endpoint.in_flight} in flight) ---")
+            if session is not None:
+                suggestion, error = await _chat_in_session(session, request, model, endpoint.url)
+            else:
+                # Call the llm_client function to interact with Ollama
+                suggestion, error = await get_ollama_suggestion(
+                    endpoint=endpoint.url,
+                    model=model,
+                    prompt=request.prompt,
+                    base64_image=request.image,
+                    options=request.options
+                )
+        if not is_endpoint_failure(error):
+            ollama_router.report_success(endpoint, model if not error else None)
+            if session is not None and not error:
+                session.endpoint_url = endpoint.url # Keep the conversation where its prefill is cached
+            return suggestion, error
+        ollama_router.report_failure(endpoint, error)
+        if not error.startswith("Connection Error"):
+            break # Upstream 5xx: don't replay a possibly long generation elsewhere
+        tried.add(endpoint.url)
+    return suggestion, error
+
+
+async def _stream_routed(request: AskRequest, model: str, session):
+    """
+    Streaming counterpart of _generate_routed. Fails over to another endpoint
+    only if the connection fails before any token was produced.
+    """
+    tried: set[str] = set()
+    for attempt in range(len(ollama_router.endpoints)):
+        sticky_url = session.endpoint_url if session is not None else None
+        async with ollama_router.acquire(model, sticky_url, exclude=tried) as endpoint:
+            logger.info(f"--- Streaming via Ollama endpoint {endpoint.url} ({endpoint.in_flight} in flight) ---")
+            if session is not None:
+                upstream = _stream_in_session(session, request, model, endpoint.url)
+            else:
+                upstream = stream_ollama_suggestion(
+                    endpoint=endpoint.url,
+                    model=model,
+                    prompt=request.prompt,
+                    base64_image=request.image,
+                    options=request.options
+                )
+            produced = False
+            retry = False
+            # Closed on every exit (failover, client gone, error), so a session turn
+            # releases its lock and drops the unanswered turn before the next attempt
+            async with aclosing(upstream):
+                async for event, data in upstream:
+                    if event == "error" and is_endpoint_failure(data):
+                        ollama_router.report_failure(endpoint, data)
+                        if not produced and data.startswith("Connection Error") and attempt + 1 < len(ollama_router.endpoints):
+                            tried.add(endpoint.url)
+                            retry = True
+                            break
+                    elif event == "done":
+                        ollama_router.report_success(endpoint, model)
+                        if session is not None:
+                            session.endpoint_url = endpoint.url
+                    produced = produced or event == "token"
+                    yield event, data
+            if not retry:
+                return
+
+
+async def _chat_in_session(session, request: AskRequest, model: str, endpoint_url: str) -> tuple[str | None, str | None]:
+    """Runs one conversation turn through Ollama /api/chat and records it in the session history."""
+    async with session.lock:
+        messages = session_store.build_messages(session, request.prompt, request.image)
+        logger.info(f"--- Session '{session.session_id}': sending {len(messages)} messages (~{session.tokens} tokens) ---")
+        suggestion, error = None, None
+        try:
+            suggestion, error = await get_ollama_chat_reply(
+                endpoint=endpoint_url,
+                model=model,
+                messages=messages,
+                options=request.options,
+                keep_alive=session_keep_alive
+            )
+        finally:
+            if suggestion is not None and not error:
+                session_store.record_reply(session, suggestion)
+            else:
+                session_store.discard_last_turn(session)
+        return suggestion, error
+
+
+async def _stream_in_session(session, request: AskRequest, model: str, endpoint_url: str):
+    """Streaming counterpart of _chat_in_session; yields llm_client (event, data) tuples."""
+    async with session.lock:
+        messages = session_store.build_messages(session, request.prompt, request.image)
+        logger.info(f"--- Session '{session.session_id}': streaming {len(messages)} messages (~{session.tokens} tokens) ---")
+        tokens = []
+        completed = False
+        try:
+            async for event, data in stream_ollama_chat(
+                endpoint=endpoint_url,
+                model=model,
+                messages=messages,
+                options=request.options,
+                keep_alive=session_keep_alive
+            ):
+                if event == "token":
+                    tokens.append(data)
+                elif event == "done":
+                    completed = True
+                yield event, data
+        finally:
+            # Only complete turns enter the history; failed or abandoned ones are dropped
+            if completed:
+                session_store.record_reply(session, "".join(tokens).strip())
+            else:
+                session_store.discard_last_turn(session)
+
+
+@app.delete("/api/sessions/{session_id}", tags=["Ollama"])
+async def delete_session(session_id: str):
+    """Forgets a conversation's server-side history."""
+    if session_store is None or not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.")
+    logger.info(f"DELETE /api/sessions/{session_id} - Session removed.")
+    return {"deleted": session_id}
+
+
+async def _prepare_image(request: AskRequest) -> AskRequest:
+    """Downscales a base64 image from a JSON request (cached by content hash)."""
+    if not request.image or image_processor is None or not process_json_images:
+        return request
+    try:
+        with metrics.timed("image_prepare"):
+            processed = await asyncio.to_thread(image_processor.process_base64, request.image)
+    except ValueError as e:
+        logger.error(f"ASK ERROR: Invalid image data: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid image data: {e}")
+    return request.model_copy(update={"image": processed})
+
+
+@app.post("/api/ask/upload", tags=["Ollama"])
+async def ask_ollama_upload(
+    http_request: Request,
+    prompt: str = Form(...),
+    model: str | None = Form(None),
+    image: UploadFile | None = File(None, description="Image as raw binary (PNG, JPEG, WebP, ...)"),
+    options: str | None = Form(None, description="Ollama generation options as a JSON object"),
+    bypass_cache: bool = Form(False),
+    stream: bool = Form(False, description="Return Server-Sent Events like /api/ask/stream"),
+):
+    """
+    Multipart variant of /api/ask. The image is uploaded as binary instead of a
+    base64 JSON string, then downscaled and re-encoded server-side before it is
+    forwarded to Ollama. Processed images are cached by content hash.
+    """
+    image_b64 = None
+    if image is not None:
+        try:
+            image_bytes = await image.read()
+        finally:
+            await image.close()
+        if image_bytes:
+            logger.info(f"POST /api/ask/upload - Image: {image.filename}, {len(image_bytes) // 1024} KB")
+            try:
+                if image_processor is not None:
+                    with metrics.timed("image_prepare"):
+                        image_b64 = await asyncio.to_thread(image_processor.process, image_bytes)
+                else:
+                    image_b64 = base64.b64encode(image_bytes).decode("ascii")
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid image data: {e}")
+
+    request = AskRequest(prompt=prompt, model=model, image=image_b64, options=_parse_options_form(options), bypass_cache=bypass_cache)
+    if stream:
+        return await _ask_stream(request, process_image=False)
+    return await _ask(request, process_image=False, http_request=http_request)
+
+
+def _parse_options_form(options: str | None) -> dict | None:
+    """Parses Ollama generation options sent as a JSON string in a multipart form field."""
+    try:
+        parsed_options = json.loads(options) if options else None
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"'options' must be a JSON object: {e}")
+    if parsed_options is not None and not isinstance(parsed_options, dict):
+        raise HTTPException(status_code=400, detail="'options' must be a JSON object.")
+    return parsed_options
+
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _sse_event(event: str, data: dict) -> str:
+    """Formats a single Server-Sent Event frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/ask/stream", tags=["Ollama"])
+async def ask_ollama_stream(request: AskRequest):
+    """
+    Streaming variant of /api/ask. Forwards tokens as Server-Sent Events as soon as
+    Ollama produces them, so the client can render the answer incrementally.
+
+    Events:
+        token: {"token": "..."} for every generated text fragment.
+        done:  Ollama's timing stats plus server-side time-to-first-token.
+        error: {"error": "..."} if the upstream generation fails mid-stream.
+
+    If the client disconnects, the stream is cancelled and the upstream Ollama
+    request is closed, which stops the generation.
+    """
+    return await _ask_stream(request, process_image=True)
+
+
+async def _ask_stream(request: AskRequest, process_image: bool) -> StreamingResponse:
+    """Shared implementation of /api/ask/stream and streamed /api/ask/upload."""
+    image_presence = "Yes" if request.image else "No"
+    logger.info(f"POST /api/ask/stream - Prompt: '{request.prompt[:50]}...', Model: {request.model or 'Default'}, Image: {image_presence}")
+
+    # Validate before the stream starts so configuration errors are plain HTTP errors
+    if not ollama_url:
+        logger.error("ASK STREAM ERROR: Ollama URL is not configured.")
+        raise HTTPException(status_code=503, detail="Ollama URL not configured in backend.")
+    model_to_use = request.model or ollama_model
+    if not model_to_use:
+        logger.error("ASK STREAM ERROR: No model specified in request and no default configured.")
+        raise HTTPException(status_code=400, detail="Ollama model not specified or configured.")
+
+    logger.info(f"--- Streaming from model '{model_to_use}' ---")
+    if process_image:
+        request = await _prepare_image(request)
+    session = _get_session(request, model_to_use)
+
+    cache_key = None
+    cached_suggestion = None
+    if response_cache is not None and session is None:
+        cache_key = make_cache_key(model_to_use, request.prompt, request.image, request.options)
+        if not request.bypass_cache:
+            cached_suggestion = await response_cache.get(cache_key)
+
+    # Reject while a plain HTTP error is still possible; waiting for a slot happens inside the stream
+    if cached_suggestion is None and admission is not None:
+        try:
+            admission.check(model_to_use)
+        except AdmissionRejected as e:
+            raise _admission_error(e)
+
+    async def event_stream():
+        if cached_suggestion is not None:
+            logger.info("Streamed suggestion served from response cache.")
+            yield _sse_event("token", {"token": cached_suggestion})
+            yield _sse_event("done", {"cached": True})
+            return
+
+        try:
+            async with _admitted(model_to_use):
+                async for frame in generate_stream():
+                    yield frame
+        except AdmissionRejected as e:
+            logger.warning(f"Admission rejected: {e}")
+            yield _sse_event("error", {"error": str(e), "retry_after": e.retry_after})
+
+    async def generate_stream():
+        started = time.perf_counter()
+        first_token_at = None
+        tokens = []
+        async for event, data in _stream_routed(request, model_to_use, session):
+            if event == "token":
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    logger.info(f"First token after {(first_token_at - started) * 1000:.0f} ms")
+                tokens.append(data)
+                yield _sse_event("token", {"token": data})
+            elif event == "done":
+                if cache_key is not None:
+                    response_cache.put(cache_key, "".join(tokens).strip())
+                stats = dict(data)
+                if first_token_at is not None:
+                    stats["time_to_first_token_ms"] = round((first_token_at - started) * 1000, 1)
+                if stats.get("eval_count") and stats.get("eval_duration"):
+                    stats["tokens_per_second"] = round(stats["eval_count"] / (stats["eval_duration"] / 1e9), 2)
+                if session is not None:
+                    stats["session_id"] = session.session_id
+                logger.info(f"Stream complete for model '{model_to_use}': {stats}")
+                yield _sse_event("done", stats)
+            else:
+                logger.error(f"Error from Ollama stream: {data}")
+                yield _sse_event("error", {"error": data})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
 # --- NEW Transcription Endpoint ---
 @app.post("/api/transcribe", response_model=TranscriptionResponse, tags=["Transcription"])
 async def handle_transcription(audio_file: UploadFile = File(..., description="Audio file to be transcribed")):
@@ -290,19 +1018,14 @@ async def handle_transcription(audio_file: UploadFile = File(..., description="A
         raise HTTPException(status_code=400, detail="Received empty audio file.")
 
     # Check if ASR model is loaded before proceeding
-    if asr_client._asr_model is None:
+    if not asr_client.is_ready():
          logger.error("Transcription request failed: ASR model not loaded.")
-         raise HTTPException(status_code=503, detail="ASR model is not available. Server might be starting or encountered loading error.")
+         raise HTTPException(status_code=503, detail=asr_client.unavailable_reason())
 
     try:
-        # Read audio data from the uploaded file in chunks to handle potentially large files
-        # Although for STT, files shouldn't be excessively large. Reading all at once is often fine.
-        audio_bytes = await audio_file.read()
-        logger.debug(f"Read {len(audio_bytes)} bytes from uploaded audio file.")
-
-        # Call the transcription function from the ASR client module
-        # This handles conversion, temporary file creation, NeMo call, and cleanup
-        transcribed_text = await asr_client.transcribe_audio_data(audio_bytes)
+        # The upload is spooled to disk by Starlette; the ASR client streams it through
+        # ffmpeg, so long recordings are never held in memory in full
+        transcribed_text = await asr_client.transcribe_audio_file(audio_file.file)
 
         logger.info(f"Transcription successful: '{transcribed_text[:70]}...'")
         # Return the successful transcription
@@ -327,23 +1050,277 @@ async def handle_transcription(audio_file: UploadFile = File(..., description="A
 # --- End NEW Transcription Endpoint ---
 
 
+# --- Streaming Transcription WebSocket ---
+@app.websocket("/ws/transcribe")
+async def stream_transcription(websocket: WebSocket, format: str = "webm", sample_rate: int = asr_client.TARGET_SAMPLE_RATE):
+    """
+    Real-time transcription while the user is still speaking.
+
+    Protocol:
+        Query params: format=webm|pcm_s16le|pcm_f32le, sample_rate (raw PCM only).
+        Client -> server: binary frames of audio; a text frame "end" (or {"type": "end"}) to finish.
+        Server -> client: {"type": "ready"}, {"type": "partial", "text": ...} while audio arrives,
+                          {"type": "final", "text": ...} after "end", or {"type": "error", "error": ...}.
+    """
+    await websocket.accept()
+    logger.info(f"WS /ws/transcribe connected - format={format}, sample_rate={sample_rate}")
+
+    if not asr_client.is_ready():
+        await websocket.send_json({"type": "error", "error": asr_client.unavailable_reason()})
+        await websocket.close(code=1011)
+        return
+    try:
+        transcriber = asr_client.StreamingTranscriber(format, sample_rate, asr_stream_chunk_seconds)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1003)
+        return
+
+    await websocket.send_json({"type": "ready"})
+    last_partial_at = time.monotonic()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                logger.info("WS /ws/transcribe - client disconnected before end-of-stream.")
+                return
+            if message.get("bytes") is not None:
+                transcriber.add_chunk(message["bytes"])
+                # Interim inference runs inline; frames arriving meanwhile queue up in the socket
+                if time.monotonic() - last_partial_at >= asr_stream_interim_seconds:
+                    last_partial_at = time.monotonic()
+                    text = await transcriber.partial()
+                    if text is not None:
+                        await websocket.send_json({"type": "partial", "text": text})
+                continue
+
+            control = (message.get("text") or "").strip()
+            if control == "end" or control.startswith("{") and json.loads(control).get("type") == "end":
+                text = await transcriber.finish()
+                logger.info(f"Streaming transcription final: '{text[:70]}...'")
+                await websocket.send_json({"type": "final", "text": text})
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        logger.info("WS /ws/transcribe - client disconnected.")
+    except Exception as e:
+        logger.error(f"Error during streaming transcription: {e}", exc_info=True)
+        try:
+            await websocket.send_json({"type": "error", "error": f"Transcription failed: {e}"})
+            await websocket.close(code=1011)
+        except Exception:
+            pass # Socket already gone
+    finally:
+        transcriber.close() # Stops the session's ffmpeg decoder
+# --- End Streaming Transcription WebSocket ---
+
+
+# --- Voice-to-answer Endpoint ---
+@app.post("/api/ask/voice", tags=["Ollama"])
+async def ask_voice(
+    audio_file: UploadFile = File(..., description="Recorded question (WebM, WAV, ...)"),
+    model: str | None = Form(None),
+    options: str | None = Form(None, description="Ollama generation options as a JSON object"),
+    session_id: str | None = Form(None),
+    bypass_cache: bool = Form(False),
+    prewarm: bool = Form(True, description="Load the model in Ollama while the audio is being transcribed"),
+):
+    """
+    Answers a spoken question in one round trip: transcribes the audio and feeds
+    the transcript straight into the Ollama call. While ASR runs, the model is
+    loaded on the Ollama endpoint that will serve the answer, so the two slowest
+    stages overlap.
+
+    Streams Server-Sent Events: one `transcript` event ({"text": ...}), then the
+    same token / done / error events as /api/ask/stream.
+    """
+    logger.info(f"POST /api/ask/voice - Received file: {audio_file.filename}, Size: {audio_file.size}, Model: {model or 'Default'}")
+    if not ollama_url:
+        raise HTTPException(status_code=503, detail="Ollama URL not configured in backend.")
+    model_to_use = model or ollama_model
+    if not model_to_use:
+        raise HTTPException(status_code=400, detail="Ollama model not specified or configured.")
+    parsed_options = _parse_options_form(options)
+    if not asr_client.is_ready():
+        raise HTTPException(status_code=503, detail=asr_client.unavailable_reason())
+
+    prewarm_task = asyncio.create_task(_prewarm(model_to_use)) if prewarm and ollama_router is not None else None
+    try:
+        transcript = await _transcribe_upload(audio_file)
+    except BaseException:
+        if prewarm_task is not None:
+            prewarm_task.cancel() # No answer will follow
+        raise
+    logger.info(f"Voice ask transcript: '{transcript[:70]}...'")
+
+    async def voice_stream():
+        try:
+            yield _sse_event("transcript", {"text": transcript}) # Sent right away, even while the model is still loading
+            if not transcript.strip():
+                yield _sse_event("error", {"error": "No speech detected in the recording."})
+                return
+            if prewarm_task is not None:
+                try:
+                    await prewarm_task # Usually done already; keeps routing on the endpoint that now has the model loaded
+                except Exception as e:
+                    logger.warning(f"Voice ask: prewarming {model_to_use} failed, answering anyway: {e}")
+            request = AskRequest(prompt=transcript, model=model_to_use, options=parsed_options, bypass_cache=bypass_cache, session_id=session_id)
+            try:
+                answer = await _ask_stream(request, process_image=False)
+            except HTTPException as e:
+                # e.g. admission rejected; the transcript is still useful to the client
+                yield _sse_event("error", {"error": str(e.detail)})
+                return
+            async for frame in answer.body_iterator:
+                yield frame
+        finally:
+            if prewarm_task is not None:
+                prewarm_task.cancel() # No-op once finished; no answer will follow otherwise
+
+    return StreamingResponse(voice_stream(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+async def _transcribe_upload(audio_file: UploadFile) -> str:
+    """Transcribes an uploaded recording, mapping failures to HTTP errors like /api/transcribe."""
+    try:
+        if not audio_file.size:
+            raise HTTPException(status_code=400, detail="Received empty audio file.")
+        return await asr_client.transcribe_audio_file(audio_file.file)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Voice ask: invalid audio data or format. {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid audio data or format: {e}")
+    except RuntimeError as e:
+        logger.error(f"Voice ask: ASR service runtime issue. {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Voice ask: unexpected transcription error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error during transcription.")
+    finally:
+        await audio_file.close()
+
+
+async def _prewarm(model: str):
+    """Loads `model` on the endpoint the next generation will be routed to, unless it is already resident there."""
+    if residency_manager is not None:
+        await residency_manager.prewarm(model) # Shares loads with UI prewarms and respects the memory budget
+        return
+    endpoint = ollama_router.pick(model)
+    if endpoint is None or model in endpoint.resident:
+        return
+    _, error = await llm_client.prewarm_model(endpoint.url, model)
+    if error is None:
+        ollama_router.report_success(endpoint, model)
+    elif is_endpoint_failure(error):
+        ollama_router.report_failure(endpoint, error)
+# --- End Voice-to-answer Endpoint ---
+
+
+# --- Batch Ask Endpoint ---
+@app.post("/api/ask/batch", tags=["Ollama"])
+async def ask_ollama_batch(request: BatchAskRequest):
+    """
+    Answers many prompts in one call, with up to `max_concurrency` in flight.
+    Each item goes through the same path as /api/ask (cache, admission control,
+    endpoint routing) and is streamed back as Server-Sent Events as soon as it
+    completes, so results arrive in completion order, keyed by item id:
+
+        event: result  data: {"id", "index", "model", "suggestion", "error", "status", "cached", "elapsed_ms"}
+        event: done    data: {"completed", "failed", "cancelled", "winner"}
+
+    With `race` (e.g. the same prompt to several models) the stream ends at the
+    first successful answer and the other generations are cancelled.
+    """
+    if not ollama_url:
+        raise HTTPException(status_code=503, detail="Ollama URL not configured in backend.")
+    items = request.items
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch contains no items.")
+    if len(items) > batch_settings["max_items"]:
+        raise HTTPException(status_code=400, detail=f"Batch has {len(items)} items; the limit is {batch_settings['max_items']}.")
+    ids = [item.id if item.id is not None else str(index) for index, item in enumerate(items)]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Batch item ids must be unique.")
+    concurrency = max(1, min(request.max_concurrency or batch_settings["max_concurrency"], batch_settings["max_concurrency"]))
+    logger.info(f"POST /api/ask/batch - {len(items)} items, concurrency {concurrency}{', race' if request.race else ''}")
+
+    async def answer(index: int, item: BatchAskItem, slots: asyncio.Semaphore) -> dict:
+        async with slots:
+            started = time.perf_counter()
+            ask = AskRequest(prompt=item.prompt, model=item.model, image=item.image, options=item.options,
+                             bypass_cache=request.bypass_cache)
+            result = {"id": ids[index], "index": index, "model": item.model or ollama_model}
+            try:
+                response = await _ask(ask, process_image=True)
+                result.update(suggestion=response.suggestion, error=None, status=200, cached=response.cached)
+            except HTTPException as e:
+                result.update(suggestion=None, error=e.detail, status=e.status_code, cached=False)
+                if e.headers and "Retry-After" in e.headers:
+                    result["retry_after"] = int(e.headers["Retry-After"])
+            result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return result
+
+    async def event_stream():
+        slots = asyncio.Semaphore(concurrency)
+        tasks = [asyncio.create_task(answer(index, item, slots)) for index, item in enumerate(items)]
+        completed, failed, winner = 0, 0, None
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                completed += result["error"] is None
+                failed += result["error"] is not None
+                yield _sse_event("result", result)
+                if request.race and result["error"] is None:
+                    winner = result["id"]
+                    break
+            pending = [index for index, task in enumerate(tasks) if not task.done()]
+            for index in pending:
+                tasks[index].cancel() # Closes the upstream request, so Ollama stops generating
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if pending:
+                logger.info(f"Batch race won by item '{winner}'; cancelled {len(pending)} slower request(s).")
+            yield _sse_event("done", {"completed": completed, "failed": failed,
+                                      "cancelled": [ids[index] for index in pending], "winner": winner})
+        finally:
+            for task in tasks:
+                task.cancel() # Client went away: stop whatever is still running
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=_SSE_HEADERS)
+# --- End Batch Ask Endpoint ---
+
+
 # --- Main Execution ---
 if __name__ == "__main__":
     # Load host and port from environment variables or use defaults
     host = os.getenv("AIFRED_HOST", "127.0.0.1")
     port = int(os.getenv("AIFRED_PORT", 8000))
+    # More than one worker needs [ASR] Mode = worker, otherwise each worker loads its own model copy
+    workers = int(os.getenv("AIFRED_WORKERS", 1))
+
+    load_config()
+    asr_worker_process = None
+    if asr_mode == "worker" and os.getenv("AIFRED_SPAWN_ASR_WORKER", "1") != "0":
+        import atexit
+        import subprocess
+        logger.info("Spawning out-of-process ASR worker (asr_worker.py)...")
+        # A fresh secret per run, inherited by the worker and the uvicorn worker processes
+        os.environ[asr_worker.AUTHKEY_ENV] = secrets.token_bytes(32).hex()
+        asr_worker_process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), "asr_worker.py")])
+        atexit.register(asr_worker_process.terminate)
+    elif workers > 1:
+        logger.warning("AIFRED_WORKERS > 1 with [ASR] Mode = local: every worker will load its own ASR model copy.")
 
     logger.info(f"Starting AIFred Backend Server on http://{host}:{port}")
-    logger.info("Using Uvicorn with reload enabled.")
+    logger.info("Using Uvicorn with reload enabled." if workers == 1 else f"Using Uvicorn with {workers} workers (reload disabled).")
 
     # Run the FastAPI app using Uvicorn
     uvicorn.run(
         "server:app",                      # App location: 'filename:app_instance_name'
         host=host,                         # Host to bind to
         port=port,                         # Port to listen on
-        reload=True,                       # Enable auto-reload on code changes
+        reload=workers == 1,               # Auto-reload only in single-process (development) mode
         reload_dirs=[os.path.dirname(__file__)], # Watch the directory containing this file
         log_config=None,                   # Disable Uvicorn's default logging to use ours
-        # Consider adding workers > 1 in production if needed, but be mindful of ASR model loading/GPU memory
-        # workers=int(os.getenv("AIFRED_WORKERS", 1))
-     )
\ No newline at end of file
+        workers=workers,                   # Safe to raise with [ASR] Mode = worker (one shared model)
+     )
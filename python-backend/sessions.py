@@ -0,0 +1,115 @@
+# python-backend/sessions.py
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TOKEN_ESTIMATE = 300 # Rough prefill cost of one image for budget purposes
+
+
+def estimate_tokens(message: dict) -> int:
+    """Cheap token estimate (~4 characters per token plus per-message overhead)."""
+    return len(message.get("content", "")) // 4 + 4 + IMAGE_TOKEN_ESTIMATE * len(message.get("images") or [])
+
+
+class ChatSession:
+    """Message history of one conversation, bound to the model it was started with."""
+
+    def __init__(self, session_id: str, model: str):
+        self.session_id = session_id
+        self.model = model
+        self.messages: list[dict] = []
+        self.endpoint_url: str | None = None # Ollama endpoint holding this conversation's cached prefill
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.lock = asyncio.Lock() # Serializes turns so history stays consistent
+
+    @property
+    def tokens(self) -> int:
+        return sum(estimate_tokens(m) for m in self.messages)
+
+
+class SessionStore:
+    """
+    Bounded, in-memory store of chat sessions for /api/chat based follow-ups.
+
+    Sessions are evicted least-recently-used beyond `max_sessions` and after
+    `ttl_seconds` of inactivity. History is trimmed oldest-first to fit
+    `max_history_tokens`; trimming cuts down to `trim_to_ratio` of the budget so
+    the history prefix (and Ollama's cached prefill for it) stays stable for
+    several turns instead of shifting on every request.
+    """
+
+    def __init__(self, max_sessions: int = 100, ttl_seconds: float = 1800.0, max_history_tokens: int = 6000, trim_to_ratio: float = 0.75):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl_seconds = ttl_seconds
+        self.max_history_tokens = max_history_tokens
+        self.trim_to_ratio = trim_to_ratio
+        self._sessions: OrderedDict[str, ChatSession] = OrderedDict()
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [sid for sid, s in self._sessions.items() if s.last_used < cutoff and not s.lock.locked()]
+        for sid in expired:
+            del self._sessions[sid]
+        if expired:
+            logger.info(f"Evicted {len(expired)} expired chat session(s).")
+
+    def get_or_create(self, session_id: str, model: str) -> ChatSession:
+        """Returns the session, starting a new one if unknown, expired or bound to another model."""
+        self._evict_expired()
+        session = self._sessions.get(session_id)
+        if session is not None and session.model != model:
+            logger.info(f"Session '{session_id}' switched model {session.model} -> {model}; starting fresh history.")
+            session = None
+        if session is None:
+            session = ChatSession(session_id, model)
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                logger.info(f"Evicted least recently used chat session '{evicted_id}'.")
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.time()
+        return session
+
+    def build_messages(self, session: ChatSession, prompt: str, image: str | None = None) -> list[dict]:
+        """Appends the user's turn to the history (trimming it to budget) and returns the messages to send."""
+        user_message = {"role": "user", "content": prompt}
+        if image:
+            user_message["images"] = [image]
+        session.messages.append(user_message)
+        self._trim(session)
+        return list(session.messages)
+
+    def record_reply(self, session: ChatSession, reply: str):
+        session.messages.append({"role": "assistant", "content": reply})
+        session.last_used = time.time()
+
+    def discard_last_turn(self, session: ChatSession):
+        """Removes the pending user message after a failed generation."""
+        if session.messages and session.messages[-1]["role"] == "user":
+            session.messages.pop()
+
+    def _trim(self, session: ChatSession):
+        if session.tokens <= self.max_history_tokens:
+            return
+        target = int(self.max_history_tokens * self.trim_to_ratio)
+        dropped = 0
+        # Drop oldest messages, but always keep the newest (current) user message
+        while len(session.messages) > 1 and session.tokens > target:
+            session.messages.pop(0)
+            dropped += 1
+        # Don't start the history with an orphaned assistant reply
+        while len(session.messages) > 1 and session.messages[0]["role"] == "assistant":
+            session.messages.pop(0)
+            dropped += 1
+        logger.info(f"Trimmed {dropped} message(s) from session '{session.session_id}' (~{session.tokens} tokens left).")
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
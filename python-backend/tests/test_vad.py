@@ -0,0 +1,49 @@
+# python-backend/tests/test_vad.py
+
+import numpy as np
+
+from vad import EnergyVAD
+
+SR = 16000
+
+
+def _tone(seconds: float, level: float = 0.3, freq: float = 150.0) -> np.ndarray:
+    t = np.arange(int(seconds * SR)) / SR
+    return (level * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def test_trims_silence_around_speech():
+    silence = np.zeros(SR, dtype=np.float32)
+    samples = np.concatenate((silence, _tone(1.0), silence))
+    result = EnergyVAD(SR, padding_ms=100).trim(samples)
+    assert result.speech_detected
+    assert 1.0 <= result.samples.size / SR <= 1.3
+    assert result.leading_seconds > 0.8 and result.trailing_seconds > 0.8
+
+
+def test_sustained_voicing_is_passed_through_untrimmed():
+    # Every frame is equally loud, so nothing clears the noise floor margin
+    samples = _tone(2.0)
+    result = EnergyVAD(SR).trim(samples)
+    assert result.speech_detected
+    assert result.samples.size == samples.size
+
+
+def test_low_snr_speech_is_passed_through_untrimmed():
+    rng = np.random.default_rng(0)
+    speech = np.concatenate((_tone(0.3), np.zeros(int(0.2 * SR), dtype=np.float32)))
+    speech = np.tile(speech, 4)
+    noise = rng.normal(0, 1, speech.size).astype(np.float32)
+    noise *= np.sqrt(np.mean(speech ** 2) / np.mean(noise ** 2) / 10 ** 0.3) # 3 dB SNR
+    samples = speech + noise
+    result = EnergyVAD(SR).trim(samples)
+    assert result.speech_detected
+    assert result.samples.size == samples.size
+
+
+def test_only_audio_below_threshold_is_silent():
+    rng = np.random.default_rng(0)
+    samples = (rng.normal(0, 1e-4, 2 * SR)).astype(np.float32) # About -80 dBFS
+    result = EnergyVAD(SR, threshold_db=-50).trim(samples)
+    assert not result.speech_detected
+    assert result.samples.size == 0
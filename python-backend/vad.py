@@ -0,0 +1,142 @@
+# python-backend/vad.py
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 20
+
+
+class VADResult:
+    """Trimmed audio plus how much was removed (all durations in seconds)."""
+    __slots__ = ("samples", "input_seconds", "leading_seconds", "trailing_seconds", "compacted_seconds", "speech_detected")
+
+    def __init__(self, samples: np.ndarray, input_seconds: float, leading_seconds: float = 0.0,
+                 trailing_seconds: float = 0.0, compacted_seconds: float = 0.0, speech_detected: bool = True):
+        self.samples = samples
+        self.input_seconds = input_seconds
+        self.leading_seconds = leading_seconds
+        self.trailing_seconds = trailing_seconds
+        self.compacted_seconds = compacted_seconds
+        self.speech_detected = speech_detected
+
+    @property
+    def removed_seconds(self) -> float:
+        return self.leading_seconds + self.trailing_seconds + self.compacted_seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "input_seconds": round(self.input_seconds, 3),
+            "removed_seconds": round(self.removed_seconds, 3),
+            "leading_seconds": round(self.leading_seconds, 3),
+            "trailing_seconds": round(self.trailing_seconds, 3),
+            "compacted_seconds": round(self.compacted_seconds, 3),
+            "speech_detected": self.speech_detected,
+        }
+
+
+def frame_energies_db(samples: np.ndarray, frame_samples: int) -> np.ndarray:
+    """RMS level of each complete frame in dBFS (the trailing partial frame is ignored)."""
+    n_frames = samples.size // frame_samples
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:n_frames * frame_samples].reshape(n_frames, frame_samples)
+    return 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+
+def _runs(mask: np.ndarray) -> list[tuple[int, int]]:
+    """[start, end) index pairs of the True runs in a boolean array."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+
+class EnergyVAD:
+    """
+    Lightweight energy-based voice activity detection for 16kHz mono float32 audio.
+
+    A 20ms frame counts as speech when its level exceeds both `threshold_db` and
+    the clip's noise floor (10th percentile frame level) plus `noise_margin_db`,
+    so the detector adapts to noisy microphones. Speech runs shorter than
+    `min_speech_ms` (clicks, pops) are ignored and `padding_ms` is kept around
+    speech so word onsets and decays are not clipped.
+
+    A clip is only treated as silent when no frame exceeds `threshold_db`. If
+    frames do but none stands out from the noise floor (sustained voicing, low
+    SNR), the clip is passed through untrimmed.
+
+    Args:
+        sample_rate: Sample rate of the audio passed to trim().
+        threshold_db: Absolute minimum level (dBFS) for speech.
+        noise_margin_db: Required level above the estimated noise floor.
+        padding_ms: Audio kept before the first and after the last speech frame (and around pauses).
+        min_speech_ms: Shorter bursts of energy are not treated as speech.
+        compact_pauses_ms: If > 0, internal pauses longer than this are shortened to this length.
+    """
+
+    def __init__(self, sample_rate: int = 16000, threshold_db: float = -50.0, noise_margin_db: float = 10.0,
+                 padding_ms: float = 250.0, min_speech_ms: float = 60.0, compact_pauses_ms: float = 0.0):
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.frame_samples = int(sample_rate * FRAME_MS / 1000)
+        self.padding_frames = int(round(padding_ms / FRAME_MS))
+        self.min_speech_frames = max(1, int(round(min_speech_ms / FRAME_MS)))
+        self.compact_pause_frames = int(round(compact_pauses_ms / FRAME_MS))
+
+    def speech_mask(self, samples: np.ndarray) -> np.ndarray:
+        """Boolean speech/non-speech decision for every complete 20ms frame."""
+        return self._speech_mask(frame_energies_db(samples, self.frame_samples))
+
+    def _speech_mask(self, levels: np.ndarray) -> np.ndarray:
+        if levels.size == 0:
+            return np.zeros(0, dtype=bool)
+        noise_floor = float(np.percentile(levels, 10))
+        mask = levels > max(self.threshold_db, noise_floor + self.noise_margin_db)
+        for start, end in _runs(mask):
+            if end - start < self.min_speech_frames:
+                mask[start:end] = False
+        return mask
+
+    def trim(self, samples: np.ndarray) -> VADResult:
+        """Drops leading/trailing silence (and compacts long pauses if configured)."""
+        sr = self.sample_rate
+        input_seconds = samples.size / sr
+        levels = frame_energies_db(samples, self.frame_samples)
+        mask = self._speech_mask(levels)
+        speech_frames = np.flatnonzero(mask)
+        if speech_frames.size == 0:
+            if levels.size and levels.max() > self.threshold_db:
+                # Nothing stands out from the clip's own floor (sustained voicing, heavy noise),
+                # but it isn't silent either: let the model decide rather than dropping it
+                return VADResult(samples, input_seconds)
+            return VADResult(samples[:0], input_seconds, leading_seconds=input_seconds, speech_detected=False)
+
+        fs = self.frame_samples
+        start = int(max(0, (speech_frames[0] - self.padding_frames) * fs))
+        end = int(min(samples.size, (speech_frames[-1] + 1 + self.padding_frames) * fs))
+        if speech_frames[-1] + 1 + self.padding_frames >= mask.size:
+            end = samples.size # Keep the partial last frame when speech runs to the end
+        leading, trailing = start / sr, (samples.size - end) / sr
+
+        if self.compact_pause_frames <= 0:
+            return VADResult(samples[start:end], input_seconds, leading, trailing)
+
+        # Shorten internal pauses: keep `compact_pause_frames` of each long silent run, split
+        # evenly around its middle, so the words either side keep their padding.
+        keep = np.ones(samples.size, dtype=bool)
+        keep[:start] = False
+        keep[end:] = False
+        for run_start, run_end in _runs(~mask[speech_frames[0]:speech_frames[-1] + 1]):
+            run_start += speech_frames[0]
+            run_end += speech_frames[0]
+            excess = (run_end - run_start) - self.compact_pause_frames
+            if excess <= 0:
+                continue
+            cut_from = run_start + self.compact_pause_frames // 2
+            keep[cut_from * fs:(cut_from + excess) * fs] = False
+        trimmed = samples[keep]
+        compacted = (end - start - trimmed.size) / sr
+        return VADResult(trimmed, input_seconds, leading, trailing, compacted)